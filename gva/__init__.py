@@ -19,6 +19,7 @@ Módulos:
     safety_orchestrator  → Coordinador de la secuencia de emergencia
     motor_hal            → Abstracción del hardware del motor
     mqtt_comm            → Comunicación con el broker MQTT
+    clock                → Timestamps en ns y formateo ISO 8601
 
 Uso rápido:
     from gva import SafetyOrchestrator, StateManager, SystemState
@@ -36,27 +37,50 @@ Uso rápido:
 
 from __future__ import annotations
 
-# ── Estado y dominio ─────────────────────────────────────────────────────────
-from state_manager import (
-    StateManager,
-    SystemState,
-    StateChangeResult,
-    InvalidStateTransitionError,
-    VALID_TRANSITIONS,
-)
-
-# ── Orquestador ──────────────────────────────────────────────────────────────
-from safety_orchestrator import (
-    SafetyOrchestrator,
-    EmergencyStopResult,
-    ResetResult,
-    OrchestratorBusyError,
-    EmergencyStopFailedError,
-)
-
-# ── Hardware y comunicaciones ─────────────────────────────────────────────────
-from motor_hal import MotorHAL, HALResult, RelayState
-from mqtt_comm import MQTTComm, MQTTResult
+import importlib
+import logging
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from safety_orchestrator import SafetyOrchestrator
+
+
+# ── Carga diferida de submódulos (PEP 562) ───────────────────────────────────
+# Cada símbolo público se importa la primera vez que se accede a él, así
+# importar el paquete no arrastra asyncio/json/dataclasses hasta que hacen falta.
+_LAZY: dict[str, str] = {
+    # Estado y dominio
+    "StateManager":                "state_manager",
+    "SystemState":                 "state_manager",
+    "StateChangeResult":           "state_manager",
+    "InvalidStateTransitionError": "state_manager",
+    "VALID_TRANSITIONS":           "state_manager",
+    # Orquestador
+    "SafetyOrchestrator":          "safety_orchestrator",
+    "EmergencyStopResult":         "safety_orchestrator",
+    "ResetResult":                 "safety_orchestrator",
+    "OrchestratorBusyError":       "safety_orchestrator",
+    "EmergencyStopFailedError":    "safety_orchestrator",
+    # Hardware y comunicaciones
+    "MotorHAL":                    "motor_hal",
+    "HALResult":                   "motor_hal",
+    "RelayState":                  "motor_hal",
+    "MQTTComm":                    "mqtt_comm",
+    "MQTTResult":                  "mqtt_comm",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value          # siguientes accesos no pasan por aquí
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
 
 
 # ── API pública del paquete ──────────────────────────────────────────────────
@@ -87,6 +111,10 @@ __author__  = "Equipo Ingeniería GVA"
 __unit__    = "GVA-07"
 __sector__  = "ALMACÉN-3"
 
+logger = logging.getLogger(__name__)
+
+_LOG_FORMAT = "%(asctime)s %(levelname)-8s %(name)s %(message)s"
+
 
 # ── Factory helper ───────────────────────────────────────────────────────────
 
@@ -94,6 +122,9 @@ def create_gva_system(
     broker_url: str = "mqtt://broker.gva-local:1883",
     unit_id:    str = "GVA-07",
     sector:     str = "ALMACÉN-3",
+    use_uvloop: bool = False,
+    simulate_latency: bool = True,
+    log_level:  Optional[int] = None,
 ) -> SafetyOrchestrator:
     """
     Factory que construye el sistema GVA completo con dependencias conectadas.
@@ -102,6 +133,16 @@ def create_gva_system(
         broker_url: URL del broker MQTT.
         unit_id:    Identificador de la unidad GVA.
         sector:     Sector de operación.
+        use_uvloop: Si es True y uvloop está instalado, instala su política
+                    de event loop. Debe llamarse antes de asyncio.run(),
+                    ya que solo afecta a los loops creados después.
+        simulate_latency: Si es False, HAL, StateManager y MQTTComm no
+                    simulan la latencia del hardware ni de la red, y el
+                    orquestador anula sus propios delays (entre pasos,
+                    posterior al paro y de restablecimiento).
+        log_level:  Si se indica, configura el logging raíz (basicConfig)
+                    con ese nivel y timestamps ISO 8601 (IsoTimeFormatter).
+                    No hace nada si la aplicación ya configuró handlers.
 
     Returns:
         SafetyOrchestrator listo para usar.
@@ -110,11 +151,43 @@ def create_gva_system(
         orch = create_gva_system()
         result = await orch.trigger()
     """
-    hal   = MotorHAL(unit_id=unit_id)
-    state = StateManager()
+    from motor_hal import MotorHAL
+    from mqtt_comm import MQTTComm
+    from safety_orchestrator import SafetyOrchestrator
+    from state_manager import StateManager
+
+    if log_level is not None:
+        _configure_logging(log_level)
+    if use_uvloop:
+        _install_uvloop()
+
+    hal   = MotorHAL(unit_id=unit_id, simulate_latency=simulate_latency)
+    state = StateManager(simulate_latency=simulate_latency)
     mqtt  = MQTTComm(
         broker_url=broker_url,
         unit_id=unit_id,
         sector=sector,
+        simulate_latency=simulate_latency,
     )
-    return SafetyOrchestrator(hal, state, mqtt)
+    return SafetyOrchestrator(hal, state, mqtt, simulate_latency=simulate_latency)
+
+
+def _install_uvloop() -> None:
+    """Instala la política de uvloop; si no está disponible, no hace nada."""
+    import asyncio
+
+    try:
+        import uvloop  # type: ignore[import-not-found]
+    except ImportError:
+        logger.warning("[GVA] uvloop no está instalado. Se usa el event loop estándar.")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def _configure_logging(level: int) -> None:
+    """Configura el logger raíz con IsoTimeFormatter."""
+    from clock import IsoTimeFormatter
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(IsoTimeFormatter(_LOG_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler])
@@ -0,0 +1,84 @@
+"""
+clock.py
+========
+Utilidades de tiempo — GVA Control de Emergencia
+Los DTOs guardan sus timestamps como enteros (ns desde epoch, vía
+time.time_ns) y solo se formatean a ISO 8601 al serializar.
+Incluye además un Formatter de logging con asctime ISO 8601 barato y el
+cálculo de esperas con deadline (min_complete_at) que comparten las capas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+# (segundo, "YYYY-MM-DDTHH:MM:SS") del último timestamp formateado. Se
+# reemplaza como una sola tupla, así que no hace falta lock entre hilos.
+_iso_cache: tuple[int, str] = (-1, "")
+
+
+def iso_from_ns(ns: int) -> str:
+    """
+    Convierte un timestamp en ns desde epoch a ISO 8601 (UTC, microsegundos).
+
+    La parte "fecha + hora:min:seg" se calcula una vez por segundo; los
+    timestamps de una misma secuencia caen casi siempre en el mismo
+    segundo y solo formatean la fracción.
+    """
+    global _iso_cache
+    sec, frac_ns = divmod(ns, 1_000_000_000)
+    cached_sec, prefix = _iso_cache
+    if sec != cached_sec:
+        prefix = datetime.fromtimestamp(sec, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        _iso_cache = (sec, prefix)
+    return f"{prefix}.{frac_ns // 1000:06d}+00:00"
+
+
+def iso_now() -> str:
+    """Instante actual en ISO 8601 (UTC)."""
+    return iso_from_ns(time.time_ns())
+
+
+def delay_until(own_s: float, min_complete_at: Optional[float]) -> float:
+    """
+    Segundos a esperar: la latencia propia de la operación o hasta
+    min_complete_at, lo que sea mayor.
+
+    min_complete_at es un instante del reloj del event loop antes del cual
+    la operación no debe completarse; permite que el llamador fusione su
+    propia espera con la latencia de la operación en lugar de sumarlas.
+    Si ya pasó, o es None, se espera solo own_s.
+    """
+    if min_complete_at is None:
+        return own_s
+    return max(own_s, min_complete_at - asyncio.get_running_loop().time())
+
+
+class IsoTimeFormatter(logging.Formatter):
+    """
+    Formatter cuyo %(asctime)s es ISO 8601 con milisegundos
+    (2026-01-01T12:00:00.123).
+
+    La parte "fecha + hora:min:seg" se calcula con strftime una sola vez
+    por segundo y se reutiliza; el resto de los registros de ese segundo
+    solo agregan los milisegundos.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._cache: tuple[int, str] = (-1, "")   # (segundo, prefijo)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        sec = int(record.created)
+        cached_sec, prefix = self._cache
+        if sec != cached_sec:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", self.converter(sec))
+            self._cache = (sec, prefix)
+        return f"{prefix}.{int(record.msecs):03d}"
@@ -9,31 +9,43 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from dataclasses import dataclass, field
-from datetime import datetime
-from enum import Enum
+from enum import IntEnum
+from typing import Optional
+
+from clock import delay_until, iso_from_ns
 
 logger = logging.getLogger(__name__)
+_log_enabled = logger.isEnabledFor   # evita crear LogRecords si el nivel está apagado
+
 
+class RelayState(IntEnum):
+    CLOSED = 0   # Energizado — motor activo
+    OPEN   = 1   # Desenergizado — motor cortado
 
-class RelayState(str, Enum):
-    CLOSED = "CLOSED"   # Energizado — motor activo
-    OPEN   = "OPEN"     # Desenergizado — motor cortado
+    @property
+    def value_str(self) -> str:
+        """Representación en logs y payloads ("CLOSED" / "OPEN")."""
+        return self._name_
 
+    def __str__(self) -> str:
+        return self._name_
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class HALResult:
     status:      str
     relay:       RelayState
     unit_id:     str
-    timestamp:   str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp:   int = field(default_factory=time.time_ns)   # ns desde epoch
 
     def to_dict(self) -> dict:
         return {
             "status":    self.status,
-            "relay":     self.relay.value,
+            "relay":     self.relay.value_str,
             "unit_id":   self.unit_id,
-            "timestamp": self.timestamp,
+            "timestamp": iso_from_ns(self.timestamp),
         }
 
 
@@ -46,45 +58,56 @@ class MotorHAL:
     simula el comportamiento con delays y logs.
 
     El delay de 350ms emula el tiempo real de apertura del relé
-    electromecánico de potencia del motor.
+    electromecánico de potencia del motor. Con simulate_latency=False
+    el relé conmuta sin espera (tests, CI).
     """
 
     RELAY_OPEN_DELAY_MS: int = 350
 
-    def __init__(self, unit_id: str = "GVA-07") -> None:
+    def __init__(self, unit_id: str = "GVA-07", simulate_latency: bool = True) -> None:
         self._unit_id    = unit_id
         self._relay_state = RelayState.CLOSED
+        self._delay_s    = self.RELAY_OPEN_DELAY_MS / 1000 if simulate_latency else 0.0
         logger.info(
             "[HAL] MotorHAL inicializado. Unidad: %s. Relé: %s",
-            unit_id, self._relay_state.value
+            unit_id, self._relay_state.value_str
         )
 
     @property
     def relay_state(self) -> RelayState:
         return self._relay_state
 
-    async def cortar_energia(self) -> dict:
-        """Abre el relé de potencia y corta la energía al motor."""
-        logger.info("[HAL] Enviando señal CORTE al controlador de potencia...")
-        await asyncio.sleep(self.RELAY_OPEN_DELAY_MS / 1000)
+    async def cortar_energia(self, min_complete_at: Optional[float] = None) -> dict:
+        """
+        Abre el relé de potencia y corta la energía al motor.
+
+        Args:
+            min_complete_at: Deadline opcional (ver clock.delay_until()).
+        """
+        if _log_enabled(logging.INFO):
+            logger.info("[HAL] Enviando señal CORTE al controlador de potencia...")
+        await asyncio.sleep(delay_until(self._delay_s, min_complete_at))
         self._relay_state = RelayState.OPEN
         result = HALResult(
             status="OK",
             relay=RelayState.OPEN,
             unit_id=self._unit_id,
         )
-        logger.info("[HAL] Relé de potencia ABIERTO. Energía cortada.")
+        if _log_enabled(logging.INFO):
+            logger.info("[HAL] Relé de potencia ABIERTO. Energía cortada.")
         return result.to_dict()
 
-    async def restaurar_energia(self) -> dict:
+    async def restaurar_energia(self, min_complete_at: Optional[float] = None) -> dict:
         """Cierra el relé de potencia y restaura la energía al motor."""
-        logger.info("[HAL] Restaurando energía al motor...")
-        await asyncio.sleep(self.RELAY_OPEN_DELAY_MS / 1000)
+        if _log_enabled(logging.INFO):
+            logger.info("[HAL] Restaurando energía al motor...")
+        await asyncio.sleep(delay_until(self._delay_s, min_complete_at))
         self._relay_state = RelayState.CLOSED
         result = HALResult(
             status="OK",
             relay=RelayState.CLOSED,
             unit_id=self._unit_id,
         )
-        logger.info("[HAL] Relé de potencia CERRADO. Energía restaurada.")
+        if _log_enabled(logging.INFO):
+            logger.info("[HAL] Relé de potencia CERRADO. Energía restaurada.")
         return result.to_dict()
@@ -10,22 +10,59 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import time
 from dataclasses import dataclass, field
-from datetime import datetime
+from typing import Optional
+
+from clock import delay_until, iso_from_ns, iso_now
+
+try:                                    # Serializador en C (opcional)
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 logger = logging.getLogger(__name__)
+_log_enabled = logger.isEnabledFor   # evita crear LogRecords si el nivel está apagado
+
+
+# ── Serialización ────────────────────────────────────────────────────────────
+# Ambas variantes producen los mismos bytes: JSON compacto en UTF-8 (sin
+# escapar caracteres no ASCII), así que el paquete no depende de cuál esté
+# instalada. orjson ya entrega bytes, que es el formato del cable MQTT.
 
+if orjson is not None:
+    _dumps = orjson.dumps
+else:
+    def _dumps(payload: dict) -> bytes:
+        return json.dumps(
+            payload, ensure_ascii=False, separators=(",", ":"),
+        ).encode()
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class MQTTResult:
     status:  str
     topic:   str
     packet:  str
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: int = field(default_factory=time.time_ns)   # ns desde epoch
+
+    def to_dict(self) -> dict:
+        return {
+            "status":    self.status,
+            "topic":     self.topic,
+            "packet":    self.packet,
+            "timestamp": iso_from_ns(self.timestamp),
+        }
 
 
 class MQTTComm:
-    """Simula la publicación MQTT. En producción usa paho-mqtt o aiomqtt."""
+    """
+    Simula la publicación MQTT. En producción usa paho-mqtt o aiomqtt.
+
+    La sesión con el broker se abre una única vez (connect()) y se
+    reutiliza en cada publish(); el CONNECT_DELAY_MS se paga solo en
+    el primer uso, y nunca con simulate_latency=False.
+    """
 
     CONNECT_DELAY_MS: int = 400
 
@@ -34,26 +71,73 @@ class MQTTComm:
         broker_url: str = "mqtt://broker.gva-local:1883",
         unit_id:    str = "GVA-07",
         sector:     str = "ALMACÉN-3",
+        simulate_latency: bool = True,
     ) -> None:
         self._broker = broker_url
         self._unit   = unit_id
         self._sector = sector
+        self._connected = False
+        self._connect_lock = asyncio.Lock()   # un solo handshake aunque haya llamadas concurrentes
+        # Campos fijos por instancia que se agregan a cada payload
+        self._template = {"unit": unit_id, "sector": sector}
+        self._connect_delay_s = (
+            self.CONNECT_DELAY_MS / 1000 if simulate_latency else 0.0
+        )
         logger.info("[MQTT] MQTTComm inicializado. Broker: %s", broker_url)
 
-    async def publish(self, topic: str, payload: dict) -> dict:
-        logger.info("[MQTT] Conectando a broker %s...", self._broker)
-        await asyncio.sleep(self.CONNECT_DELAY_MS / 1000)
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
 
-        full_payload = {
-            **payload,
-            "ts":     datetime.now().isoformat(),
-            "unit":   self._unit,
-            "sector": self._sector,
-        }
-        packet = json.dumps(full_payload, ensure_ascii=False)
+    async def connect(self) -> None:
+        """
+        Abre la sesión con el broker. Si ya está abierta, no hace nada; si
+        otra corrutina la está abriendo, espera a ese mismo handshake.
+        """
+        if self._connected:
+            return
+        async with self._connect_lock:
+            if self._connected:
+                return
+            logger.info("[MQTT] Conectando a broker %s...", self._broker)
+            await asyncio.sleep(self._connect_delay_s)
+            self._connected = True
+            logger.info("[MQTT] Conexión establecida con %s", self._broker)
+
+    async def publish(
+        self,
+        topic: str,
+        payload: dict,
+        min_complete_at: Optional[float] = None,
+    ) -> dict:
+        """
+        Publica el payload en el topic indicado.
+
+        Args:
+            topic:           Topic MQTT destino.
+            payload:         Datos del evento; se completan con ts/unit/sector.
+            min_complete_at: Deadline opcional (ver clock.delay_until()). La
+                             latencia de conexión, si la hay, se solapa con
+                             esa espera.
+        """
+        if not self._connected:
+            await self.connect()
+        if min_complete_at is not None:
+            await asyncio.sleep(delay_until(0.0, min_complete_at))
+
+        full_payload = payload.copy()
+        full_payload["ts"] = iso_now()
+        full_payload.update(self._template)
+        return self._send(topic, _dumps(full_payload))
+
+    # ── Internos ─────────────────────────────────────────────────────────────
 
-        logger.info("[MQTT] PUBLISH → %s", topic)
-        logger.warning("[MQTT] Payload: %s", packet)
-        logger.info("[MQTT] ✓ Mensaje publicado. ACK recibido del broker.")
+    def _send(self, topic: str, packet: bytes) -> dict:
+        """Punto de salida al broker (en producción: client.publish)."""
+        text = packet.decode()
+        if _log_enabled(logging.INFO):
+            logger.info("[MQTT] PUBLISH → %s", topic)
+            logger.debug("[MQTT] Payload: %s", text)
+            logger.info("[MQTT] ✓ Mensaje publicado. ACK recibido del broker.")
 
-        return MQTTResult(status="OK", topic=topic, packet=packet).__dict__
+        return MQTTResult(status="OK", topic=topic, packet=text).to_dict()
@@ -10,6 +10,9 @@ Secuencia:
     2. StateManager.cambiar_estado()  → Actualización del dominio
     3. MQTTComm.publish()             → Notificación al broker
 
+Los pasos 1 y 2 (y la conexión al broker) se solapan en el tiempo;
+el paso 3 espera a que ambos hayan terminado.
+
 El orquestador es idempotente: si ya está ejecutando una
 secuencia, ignora llamadas adicionales (guard clause).
 """
@@ -17,33 +20,35 @@ secuencia, ignora llamadas adicionales (guard clause).
 from __future__ import annotations
 
 import asyncio
+import builtins
 import logging
+import time
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Optional
+from typing import Any, Coroutine, Optional, Protocol
 
 from state_manager import StateManager, StateChangeResult, SystemState
 
 logger = logging.getLogger(__name__)
+_log_enabled = logger.isEnabledFor   # evita crear LogRecords si el nivel está apagado
 
 
 # ── DTOs de resultado ────────────────────────────────────────────────────────
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EmergencyStopResult:
     status:       str
     hal_result:   dict
     state_result: StateChangeResult
     mqtt_result:  dict
     duration_ms:  float
-    timestamp:    str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp:    int = field(default_factory=time.time_ns)   # ns desde epoch
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ResetResult:
     status:    str
     duration_ms: float
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: int = field(default_factory=time.time_ns)   # ns desde epoch
 
 
 # ── Excepciones ──────────────────────────────────────────────────────────────
@@ -58,13 +63,82 @@ class EmergencyStopFailedError(Exception):
     pass
 
 
+# ── Puertos de las dependencias ──────────────────────────────────────────────
+# Protocolos estructurales: el orquestador solo depende de estos métodos, así
+# que acepta MotorHAL/MQTTComm o cualquier doble de test con la misma forma.
+
+class MotorPort(Protocol):
+    async def cortar_energia(self, min_complete_at: Optional[float] = None) -> dict: ...
+
+
+class PublisherPort(Protocol):
+    async def connect(self) -> None: ...
+
+    async def publish(
+        self,
+        topic: str,
+        payload: dict,
+        min_complete_at: Optional[float] = None,
+    ) -> dict: ...
+
+
+# ── Helpers ──────────────────────────────────────────────────────────────────
+
+
+# asyncio.TaskGroup y ExceptionGroup existen desde Python 3.11; en 3.10 se
+# usa una tarea suelta que se cancela a mano y no se generan grupos.
+_TaskGroup = getattr(asyncio, "TaskGroup", None)
+_ExceptionGroup: Any = getattr(builtins, "BaseExceptionGroup", ())
+
+
+class _Background:
+    """
+    Context manager async que ejecuta `coro` como tarea mientras dura el
+    bloque. Si el bloque falla la tarea se cancela, y en todos los casos
+    termina antes de salir: no quedan tareas huérfanas ni timers vivos.
+    (Clase y no asynccontextmanager: mypyc no compila generadores async.)
+    """
+
+    def __init__(self, coro: Coroutine[Any, Any, None]) -> None:
+        self._coro = coro
+        self._group: Any = None
+        self._task: Optional[asyncio.Future] = None
+
+    async def __aenter__(self) -> None:
+        if _TaskGroup is not None:
+            self._group = _TaskGroup()
+            await self._group.__aenter__()
+            self._group.create_task(self._coro)
+        else:
+            self._task = asyncio.ensure_future(self._coro)
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self._group is not None:
+            await self._group.__aexit__(exc_type, exc, tb)
+            return
+        assert self._task is not None
+        if exc_type is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        else:
+            await self._task
+
+
+def _unwrap(exc: BaseException) -> BaseException:
+    """Extrae la excepción original de un ExceptionGroup de un solo elemento."""
+    while isinstance(exc, _ExceptionGroup) and len(exc.exceptions) == 1:
+        exc = exc.exceptions[0]
+    return exc
+
+
 # ── SafetyOrchestrator ───────────────────────────────────────────────────────
 
 class SafetyOrchestrator:
     """
     Caso de uso central del sistema GVA de seguridad.
 
-    Coordina las tres capas del sistema en orden secuencial garantizado.
+    Coordina las tres capas del sistema respetando el orden de seguridad
+    (corte antes que notificación) y solapando los pasos independientes.
     Implementa el patrón Orchestrator con guard clause para evitar
     ejecuciones concurrentes del mismo evento de emergencia.
 
@@ -81,21 +155,28 @@ class SafetyOrchestrator:
 
     STEP_DELAY_MS:    int = 200   # Delay entre pasos para observabilidad
     POST_STOP_DELAY_MS: int = 300 # Delay final antes de reportar completado
+    RESET_DELAY_MS:   int = 300   # Espera mínima del restablecimiento
 
     MQTT_TOPIC_EMERGENCY: str = "gva/07/safety/emergency"
     MQTT_TOPIC_RESTORE:   str = "gva/07/safety/restore"
 
     def __init__(
         self,
-        motor_hal,
+        motor_hal: MotorPort,
         state_manager: StateManager,
-        mqtt_comm,
+        mqtt_comm: PublisherPort,
+        simulate_latency: bool = True,
     ) -> None:
-        self._hal:   object        = motor_hal
+        self._hal:   MotorPort     = motor_hal
         self._state: StateManager  = state_manager
-        self._mqtt:  object        = mqtt_comm
+        self._mqtt:  PublisherPort = mqtt_comm
         self._running: bool        = False
         self._last_result: Optional[EmergencyStopResult] = None
+        # Delays propios del orquestador; con simulate_latency=False son 0.
+        scale = 1 / 1000 if simulate_latency else 0.0
+        self._step_delay_s:      float = self.STEP_DELAY_MS * scale
+        self._post_stop_delay_s: float = self.POST_STOP_DELAY_MS * scale
+        self._reset_delay_s:     float = self.RESET_DELAY_MS * scale
 
     # ── Propiedades públicas ─────────────────────────────────────────────────
 
@@ -118,6 +199,14 @@ class SafetyOrchestrator:
             2. Cambio de estado vía StateManager       (300ms)
             3. Publicación MQTT vía MQTTComm           (400ms)
 
+        Invariantes de orden:
+            - La orden de corte se despacha antes que la transición de
+              estado; ambas (y la conexión MQTT) corren en paralelo.
+            - La notificación MQTT se publica solo con el relé abierto
+              y el estado ya en EMERGENCY_STOP.
+            - El STEP_DELAY_MS no se suma: se pasa como deadline
+              (min_complete_at) a la publicación y se solapa con ella.
+
         Returns:
             EmergencyStopResult con resultados de cada paso.
 
@@ -125,54 +214,89 @@ class SafetyOrchestrator:
             OrchestratorBusyError:    Si ya hay una secuencia en curso.
             EmergencyStopFailedError: Si algún paso falla.
         """
+        # Guard clause: la comprobación y la asignación no tienen ningún
+        # await entre medio, así que son atómicas dentro del event loop;
+        # dos trigger() concurrentes nunca pasan ambos.
         if self._running:
             raise OrchestratorBusyError(
                 "SafetyOrchestrator ya está ejecutando una secuencia. "
                 "Ignorando llamada duplicada."
             )
 
+        # NUNCA se libera automáticamente tras un EMERGENCY_STOP real (ni
+        # tras un fallo): solo reset() vuelve self._running a False, lo que
+        # fuerza la intervención manual del operador.
         self._running = True
-        t_start = asyncio.get_event_loop().time()
+        loop = asyncio.get_running_loop()
+        # Los deadlines usan el reloj del loop; la duración, perf_counter:
+        # el reloj de uvloop tiene resolución de milisegundos y una
+        # secuencia rápida daría duration_ms == 0.
+        t_start = time.perf_counter()
+        verbose = _log_enabled(logging.INFO)
 
         logger.error(
             "[ORCH] ══ SECUENCIA DE PARO DE EMERGENCIA INICIADA ══"
         )
 
+        hal_task = None
         try:
             # ── Paso 1/3: HAL ────────────────────────────────────────────────
-            logger.info("[ORCH] Paso 1/3 → Corte de energía vía MotorHAL")
-            hal_result = await self._hal.cortar_energia()
-            logger.info("[ORCH] HAL retornó: %s", hal_result)
-            await asyncio.sleep(self.STEP_DELAY_MS / 1000)
-
-            # ── Paso 2/3: StateManager ───────────────────────────────────────
-            logger.info("[ORCH] Paso 2/3 → Actualización de estado vía StateManager")
-            state_result = await self._state.cambiar_estado(SystemState.EMERGENCY_STOP)
-            logger.info("[ORCH] StateManager retornó: %s", state_result)
-            await asyncio.sleep(self.STEP_DELAY_MS / 1000)
-
-            # ── Paso 3/3: MQTT ───────────────────────────────────────────────
-            logger.info("[ORCH] Paso 3/3 → Notificación vía MQTTComm")
-            mqtt_payload = {
-                "event":     "EMERGENCY_STOP",
-                "trigger":   "MANUAL_BUTTON",
-                "hal_status": hal_result.get("relay"),
-                "state":     state_result.state.value,
-            }
-            mqtt_result = await self._mqtt.publish(
-                self.MQTT_TOPIC_EMERGENCY,
-                mqtt_payload,
-            )
-            logger.info("[ORCH] MQTTComm retornó: %s", mqtt_result)
-
-            await asyncio.sleep(self.POST_STOP_DELAY_MS / 1000)
-
-            duration_ms = (asyncio.get_event_loop().time() - t_start) * 1000
+            # El corte corre como tarea fuera del grupo: la latencia del relé
+            # se solapa con la transición de estado, y un fallo de otro paso
+            # nunca lo cancela.
+            if verbose:
+                logger.info("[ORCH] Paso 1/3 → Corte de energía vía MotorHAL")
+            hal_task = asyncio.ensure_future(self._hal.cortar_energia())
+
+            # La conexión al broker se abre en paralelo dentro de un grupo de
+            # tareas: si la secuencia falla se cancela junto con ella.
+            async with _Background(self._connect_broker()):
+                # Ceder un ciclo al loop garantiza que la orden de corte se
+                # despacha antes que la transición de estado. Si el HAL falla
+                # de inmediato, el dominio no se toca.
+                await asyncio.sleep(0)
+                if hal_task.done():
+                    hal_task.result()
+
+                # ── Paso 2/3: StateManager ───────────────────────────────────
+                if verbose:
+                    logger.info("[ORCH] Paso 2/3 → Actualización de estado vía StateManager")
+                state_result = await self._state.cambiar_estado(SystemState.EMERGENCY_STOP)
+                if verbose:
+                    logger.info("[ORCH] StateManager retornó: %s", state_result)
+
+                hal_result = await hal_task
+                if verbose:
+                    logger.info("[ORCH] HAL retornó: %s", hal_result)
+
+                # ── Paso 3/3: MQTT ───────────────────────────────────────────
+                # Solo se notifica con el relé ya abierto. El delay entre
+                # pasos se pasa como deadline y se solapa con la publicación.
+                if verbose:
+                    logger.info("[ORCH] Paso 3/3 → Notificación vía MQTTComm")
+                mqtt_payload = {
+                    "event":     "EMERGENCY_STOP",
+                    "trigger":   "MANUAL_BUTTON",
+                    "hal_status": hal_result.get("relay"),
+                    "state":     state_result.state.value_str,
+                }
+                mqtt_result = await self._mqtt.publish(
+                    self.MQTT_TOPIC_EMERGENCY,
+                    mqtt_payload,
+                    min_complete_at=loop.time() + self._step_delay_s,
+                )
+                if verbose:
+                    logger.info("[ORCH] MQTTComm retornó: %s", mqtt_result)
+
+            await asyncio.sleep(self._post_stop_delay_s)
+
+            duration_ms = (time.perf_counter() - t_start) * 1000
             logger.error(
                 "[ORCH] ══ PARO DE EMERGENCIA COMPLETADO — %.0fms ══",
                 duration_ms,
             )
-            logger.info("[ORCH] Sistema en modo seguro. Esperando acción de operador.")
+            if verbose:
+                logger.info("[ORCH] Sistema en modo seguro. Esperando acción de operador.")
 
             self._last_result = EmergencyStopResult(
                 status="OK",
@@ -183,21 +307,45 @@ class SafetyOrchestrator:
             )
             return self._last_result
 
-        except Exception as exc:
-            duration_ms = (asyncio.get_event_loop().time() - t_start) * 1000
+        except Exception as group_exc:
+            exc = _unwrap(group_exc)
+            # El corte de energía nunca se cancela: se espera a que el relé
+            # termine de operar antes de reportar el fallo. Si el corte
+            # también falló, ese error se reporta aunque no sea el primero.
+            hal_exc: Optional[BaseException] = None
+            if hal_task is not None:
+                outcomes: list[Any] = await asyncio.gather(hal_task, return_exceptions=True)
+                hal_outcome = outcomes[0]
+                if isinstance(hal_outcome, BaseException) and hal_outcome is not exc:
+                    hal_exc = hal_outcome
+
+            duration_ms = (time.perf_counter() - t_start) * 1000
             logger.critical(
                 "[ORCH] ✗ FALLO EN SECUENCIA DE EMERGENCIA (%.0fms): %s",
                 duration_ms, exc,
             )
-            raise EmergencyStopFailedError(
-                f"La secuencia de paro de emergencia falló: {exc}"
-            ) from exc
-
-        finally:
-            # NUNCA liberar el lock automáticamente tras un EMERGENCY_STOP real.
-            # Solo SystemReset debe hacer self._running = False.
-            # En este diseño dejamos el lock activo para forzar el reset manual.
-            pass
+            message = f"La secuencia de paro de emergencia falló: {exc}"
+            if hal_exc is not None:
+                logger.critical(
+                    "[ORCH] ✗ FALLO EN CORTE DE ENERGÍA (relé sin confirmar): %s",
+                    hal_exc,
+                )
+                message += f" | corte de energía también falló: {hal_exc}"
+            # La causa se asigna a mano: el código compilado con mypyc no
+            # conserva la de `raise ... from` dentro de un except async.
+            error = EmergencyStopFailedError(message)
+            error.__cause__ = exc
+            raise error
+
+    async def _connect_broker(self) -> None:
+        """
+        Abre la sesión MQTT por adelantado. Un fallo aquí no aborta el paro:
+        publish() reintenta la conexión y es ese paso el que lo reporta.
+        """
+        try:
+            await self._mqtt.connect()
+        except Exception as exc:
+            logger.warning("[ORCH] Conexión anticipada al broker fallida: %s", exc)
 
     async def reset(self) -> ResetResult:
         """
@@ -209,14 +357,14 @@ class SafetyOrchestrator:
             ResetResult con duración y timestamp.
         """
         logger.warning("[ORCH] ── Iniciando secuencia de restablecimiento... ──")
-        t_start = asyncio.get_event_loop().time()
-
-        await asyncio.sleep(0.3)
+        # Igual que en trigger(): la duración se mide con perf_counter.
+        t_start = time.perf_counter()
 
-        # Restaurar estado de dominio
-        await self._state.cambiar_estado(SystemState.RESTORING)
-        await asyncio.sleep(0.1)
-        await self._state.cambiar_estado(SystemState.NORMAL)
+        # Restaurar estado de dominio (EMERGENCY_STOP → RESTORING → NORMAL);
+        # la espera de RESET_DELAY_MS se solapa con el delay de la transición.
+        await self._state.restore(
+            min_complete_at=asyncio.get_running_loop().time() + self._reset_delay_s,
+        )
 
         # Notificar al broker
         await self._mqtt.publish(
@@ -228,7 +376,7 @@ class SafetyOrchestrator:
         )
 
         self._running = False
-        duration_ms = (asyncio.get_event_loop().time() - t_start) * 1000
+        duration_ms = (time.perf_counter() - t_start) * 1000
 
         logger.info(
             "[ORCH] ── Sistema restablecido correctamente (%.0fms) ──",
@@ -14,30 +14,53 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime
-from enum import Enum
+from enum import IntEnum
 from typing import Callable, Optional
 
+from clock import delay_until, iso_from_ns
+
 logger = logging.getLogger(__name__)
+_log_enabled = logger.isEnabledFor   # evita crear LogRecords si el nivel está apagado
 
 
 # ── Enum de estados válidos ──────────────────────────────────────────────────
 
-class SystemState(str, Enum):
-    NORMAL         = "NORMAL"
-    EMERGENCY_STOP = "EMERGENCY_STOP"
-    RESTORING      = "RESTORING"
+class SystemState(IntEnum):
+    """
+    Estados del sistema. IntEnum para que hash/igualdad sean enteros;
+    el nombre es la representación en logs y payloads (value_str).
+    """
+    NORMAL         = 0
+    EMERGENCY_STOP = 1
+    RESTORING      = 2
+
+    @property
+    def value_str(self) -> str:
+        return self._name_
+
+    def __str__(self) -> str:
+        return self._name_
 
 
 # ── DTOs de resultado ────────────────────────────────────────────────────────
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class StateChangeResult:
     status:    str
     state:     SystemState
     previous:  SystemState
-    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    timestamp: int = field(default_factory=time.time_ns)   # ns desde epoch
+
+    def to_dict(self) -> dict:
+        return {
+            "status":    self.status,
+            "state":     self.state.value_str,
+            "previous":  self.previous.value_str,
+            "timestamp": iso_from_ns(self.timestamp),
+        }
 
 
 # ── Excepciones de dominio ───────────────────────────────────────────────────
@@ -49,10 +72,16 @@ class InvalidStateTransitionError(Exception):
 
 # ── Transiciones permitidas ──────────────────────────────────────────────────
 
-VALID_TRANSITIONS: dict[SystemState, list[SystemState]] = {
-    SystemState.NORMAL:         [SystemState.EMERGENCY_STOP],
-    SystemState.EMERGENCY_STOP: [SystemState.RESTORING],
-    SystemState.RESTORING:      [SystemState.NORMAL],
+# Indexada por el valor entero del estado de origen.
+_ALLOWED: tuple[frozenset[SystemState], ...] = (
+    frozenset({SystemState.EMERGENCY_STOP}),   # NORMAL
+    frozenset({SystemState.RESTORING}),        # EMERGENCY_STOP
+    frozenset({SystemState.NORMAL}),           # RESTORING
+)
+
+# Vista por nombre de la misma tabla (API pública).
+VALID_TRANSITIONS: dict[SystemState, frozenset[SystemState]] = {
+    state: _ALLOWED[state] for state in SystemState
 }
 
 
@@ -63,7 +92,10 @@ class StateManager:
     Gestiona el estado del dominio GVA.
 
     Aplica el patrón State Machine con validación de transiciones.
-    El delay de 300ms emula la latencia real del sistema embebido.
+    El delay de 300ms emula la latencia real del sistema embebido;
+    con simulate_latency=False la transición es inmediata.
+    El historial es un buffer circular: conserva las últimas
+    `history_size` transiciones.
 
     Uso:
         manager = StateManager()
@@ -77,15 +109,20 @@ class StateManager:
         self,
         initial_state: SystemState = SystemState.NORMAL,
         on_state_change: Optional[Callable[[SystemState, SystemState], None]] = None,
+        history_size: int = 1024,
+        simulate_latency: bool = True,
     ) -> None:
         self._state:           SystemState = initial_state
         self._on_state_change: Optional[Callable] = on_state_change
-        self._history:         list[tuple[SystemState, str]] = [
-            (initial_state, datetime.now().isoformat())
-        ]
+        self._delay_s:         float = (
+            self.TRANSITION_DELAY_MS / 1000 if simulate_latency else 0.0
+        )
+        self._history:         deque[tuple[SystemState, int]] = deque(
+            [(initial_state, time.time_ns())], maxlen=history_size,
+        )
         logger.info(
             "[STATE] StateManager inicializado. Estado: %s",
-            self._state.value,
+            self._state.value_str,
         )
 
     # ── Propiedades públicas ─────────────────────────────────────────────────
@@ -95,9 +132,9 @@ class StateManager:
         return self._state
 
     @property
-    def history(self) -> list[tuple[SystemState, str]]:
-        """Devuelve el historial de estados con su timestamp."""
-        return list(self._history)
+    def history(self) -> tuple[tuple[SystemState, int], ...]:
+        """Devuelve una copia del historial: (estado, timestamp en ns desde epoch)."""
+        return tuple(self._history)
 
     @property
     def is_emergency(self) -> bool:
@@ -105,12 +142,17 @@ class StateManager:
 
     # ── Lógica de transición ─────────────────────────────────────────────────
 
-    async def cambiar_estado(self, new_state: SystemState) -> StateChangeResult:
+    async def cambiar_estado(
+        self,
+        new_state: SystemState,
+        min_complete_at: Optional[float] = None,
+    ) -> StateChangeResult:
         """
         Transiciona al nuevo estado con validación y delay simulado.
 
         Args:
-            new_state: Estado destino de la transición.
+            new_state:       Estado destino de la transición.
+            min_complete_at: Deadline opcional (ver clock.delay_until()).
 
         Returns:
             StateChangeResult con status OK y metadatos.
@@ -121,17 +163,18 @@ class StateManager:
         self._validate_transition(new_state)
 
         previous = self._state
-        logger.info(
-            "[STATE] Transición: %s → %s",
-            previous.value,
-            new_state.value,
-        )
+        if _log_enabled(logging.INFO):
+            logger.info(
+                "[STATE] Transición: %s → %s",
+                previous.value_str,
+                new_state.value_str,
+            )
 
         # Simula latencia del sistema embebido
-        await asyncio.sleep(self.TRANSITION_DELAY_MS / 1000)
+        await asyncio.sleep(delay_until(self._delay_s, min_complete_at))
 
         self._state = new_state
-        ts = datetime.now().isoformat()
+        ts = time.time_ns()
         self._history.append((new_state, ts))
 
         if self._on_state_change:
@@ -140,12 +183,12 @@ class StateManager:
         if new_state == SystemState.EMERGENCY_STOP:
             logger.error(
                 "[STATE] ⚠ Estado crítico activado: %s",
-                new_state.value,
+                new_state.value_str,
             )
-        else:
+        elif _log_enabled(logging.INFO):
             logger.info(
                 "[STATE] Estado actualizado a: %s",
-                new_state.value,
+                new_state.value_str,
             )
 
         return StateChangeResult(
@@ -155,14 +198,74 @@ class StateManager:
             timestamp=ts,
         )
 
-    def _validate_transition(self, new_state: SystemState) -> None:
-        """Valida que la transición sea permitida según la máquina de estados."""
-        allowed = VALID_TRANSITIONS.get(self._state, [])
+    async def restore(self, min_complete_at: Optional[float] = None) -> StateChangeResult:
+        """
+        Restablece EMERGENCY_STOP → RESTORING → NORMAL como una sola transición.
+
+        Ambos pasos se validan antes de tocar el estado y comparten un único
+        delay simulado. El historial y el callback registran los dos pasos, y
+        durante cada callback current_state ya es el destino de ese paso.
+
+        Args:
+            min_complete_at: Igual que en cambiar_estado().
+
+        Returns:
+            StateChangeResult del último paso (RESTORING → NORMAL).
+
+        Raises:
+            InvalidStateTransitionError: Si algún paso no está permitido.
+        """
+        previous = self._state
+        self._validate_transition(SystemState.RESTORING)
+        self._validate_transition(SystemState.NORMAL, current=SystemState.RESTORING)
+
+        if _log_enabled(logging.INFO):
+            logger.info(
+                "[STATE] Transición: %s → RESTORING → NORMAL",
+                previous.value_str,
+            )
+
+        await asyncio.sleep(delay_until(self._delay_s, min_complete_at))
+
+        ts = time.time_ns()
+        self._state = SystemState.RESTORING
+        self._history.append((SystemState.RESTORING, ts))
+        if self._on_state_change:
+            self._on_state_change(previous, SystemState.RESTORING)
+
+        self._state = SystemState.NORMAL
+        self._history.append((SystemState.NORMAL, ts))
+        if self._on_state_change:
+            self._on_state_change(SystemState.RESTORING, SystemState.NORMAL)
+
+        if _log_enabled(logging.INFO):
+            logger.info("[STATE] Estado actualizado a: NORMAL")
+
+        return StateChangeResult(
+            status="OK",
+            state=SystemState.NORMAL,
+            previous=SystemState.RESTORING,
+            timestamp=ts,
+        )
+
+    def _validate_transition(
+        self,
+        new_state: SystemState,
+        current: Optional[SystemState] = None,
+    ) -> None:
+        """
+        Valida que la transición sea permitida según la máquina de estados.
+
+        current indica el estado de origen si no es el actual (pasos
+        intermedios de restore()).
+        """
+        origin = self._state if current is None else current
+        allowed = _ALLOWED[origin]
         if new_state not in allowed:
             raise InvalidStateTransitionError(
-                f"Transición inválida: {self._state.value} → {new_state.value}. "
-                f"Permitidas desde {self._state.value}: "
-                f"{[s.value for s in allowed]}"
+                f"Transición inválida: {origin.value_str} → {new_state.value_str}. "
+                f"Permitidas desde {origin.value_str}: "
+                f"{[s.value_str for s in sorted(allowed)]}"
             )
 
     def reset(self) -> None:
@@ -0,0 +1,36 @@
+"""
+setup_mypyc.py
+==============
+Build AOT opcional — GVA Control de Emergencia
+Compila los módulos del núcleo con mypyc a extensiones C para los
+despliegues embebidos (requiere: pip install mypy).
+
+Uso (desde la raíz del proyecto):
+    python setup_mypyc.py build_ext --inplace
+
+Las extensiones (.so / .pyd) quedan junto a los fuentes en gva/ y Python
+las prefiere sobre los .py. Los tests parchean atributos de clase y usan
+mocks, cosa que las clases compiladas no admiten: borrar las extensiones
+antes de correr pytest (rm gva/*.so).
+"""
+
+import os
+
+from setuptools import setup
+from mypyc.build import mypycify
+
+# Los módulos se importan en plano (from state_manager import ...), así que
+# se compilan desde gva/ para que los nombres de las extensiones coincidan.
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gva"))
+
+MYPYC_TARGETS = [
+    "clock.py",
+    "state_manager.py",
+    "motor_hal.py",
+    "safety_orchestrator.py",
+]
+
+setup(
+    name="gva-mypyc",
+    ext_modules=mypycify(["--explicit-package-bases", *MYPYC_TARGETS]),
+)
@@ -0,0 +1,86 @@
+"""
+smoke_mypyc.py
+==============
+Prueba de humo del build compilado (mypyc) — GVA Control de Emergencia
+Verifica que los módulos del núcleo se cargan desde las extensiones C y
+que se comportan como los fuentes: trigger(), reset() y la ruta de fallo
+con su cadena de causas. pytest corre siempre contra los .py, así que esta
+es la única verificación del artefacto que genera setup_mypyc.py.
+
+Uso (desde la raíz del proyecto, tras compilar):
+    python setup_mypyc.py build_ext --inplace
+    python smoke_mypyc.py
+"""
+
+import asyncio
+import importlib
+import importlib.machinery
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gva"))
+
+COMPILED_MODULES = ("clock", "state_manager", "motor_hal", "safety_orchestrator")
+
+
+def _check_compiled() -> None:
+    """Falla si algún módulo del núcleo se cargó desde su .py."""
+    suffixes = tuple(importlib.machinery.EXTENSION_SUFFIXES)
+    for name in COMPILED_MODULES:
+        path = importlib.import_module(name).__file__ or ""
+        if not path.endswith(suffixes):
+            raise SystemExit(f"[SMOKE] ✗ {name} no está compilado: {path}")
+        print(f"[SMOKE] ✓ {name} ← {os.path.basename(path)}")
+
+
+class _FailingHAL:
+    """HAL cuyo corte de energía falla: ejercita la ruta de error."""
+
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+    async def cortar_energia(self, min_complete_at=None) -> dict:
+        raise self.exc
+
+
+async def _run() -> None:
+    from state_manager import StateManager, SystemState
+    from motor_hal import MotorHAL
+    from mqtt_comm import MQTTComm
+    from safety_orchestrator import SafetyOrchestrator, EmergencyStopFailedError
+
+    # Secuencia completa: trigger() → reset()
+    state = StateManager(simulate_latency=False)
+    orch = SafetyOrchestrator(
+        MotorHAL(simulate_latency=False), state, MQTTComm(simulate_latency=False),
+        simulate_latency=False,
+    )
+    result = await orch.trigger()
+    assert result.status == "OK", result
+    assert result.hal_result["relay"] == "OPEN", result.hal_result
+    assert state.current_state == SystemState.EMERGENCY_STOP
+    reset = await orch.reset()
+    assert reset.status == "OK", reset
+    assert state.current_state == SystemState.NORMAL
+    assert not orch.is_running
+    print("[SMOKE] ✓ trigger() y reset()")
+
+    # Ruta de fallo: el error original debe quedar como __cause__
+    original = RuntimeError("causa raíz")
+    orch = SafetyOrchestrator(
+        _FailingHAL(original), StateManager(simulate_latency=False),
+        MQTTComm(simulate_latency=False), simulate_latency=False,
+    )
+    try:
+        await orch.trigger()
+    except EmergencyStopFailedError as err:
+        assert err.__cause__ is original, f"__cause__ = {err.__cause__!r}"
+    else:
+        raise AssertionError("trigger() no lanzó EmergencyStopFailedError")
+    print("[SMOKE] ✓ EmergencyStopFailedError encadena la causa original")
+
+
+if __name__ == "__main__":
+    _check_compiled()
+    asyncio.run(_run())
+    print("[SMOKE] Build compilado OK")
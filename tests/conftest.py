@@ -0,0 +1,90 @@
+# tests/conftest.py — Fixtures compartidas por la suite
+import asyncio
+import importlib.util
+import os
+
+import pytest
+
+try:                                    # Event loop basado en libuv (opcional)
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+# ══════════════════════════════════════════════════════════════════
+#  gva/__init__.py cargado una sola vez por sesión
+# ══════════════════════════════════════════════════════════════════
+
+@pytest.fixture(scope="session")
+def gva_init_module():
+    """
+    Módulo gva/__init__.py cargado una única vez y compartido. No importa
+    submódulos al cargarse (PEP 562): se resuelven vía sys.path al usarlos.
+    Con LazyLoader el cuerpo se ejecuta recién en el primer acceso a un
+    atributo, así que un test que no lo usa no paga su ejecución.
+    """
+    init_path = os.path.join(os.path.dirname(__file__), '..', 'gva', '__init__.py')
+    spec = importlib.util.spec_from_file_location("gva_init", init_path)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    mod = importlib.util.module_from_spec(spec)
+    loader.exec_module(mod)
+    return mod
+
+
+@pytest.fixture(scope="session")
+def gva_factory(gva_init_module):
+    """create_gva_system() del módulo compartido."""
+    return gva_init_module.create_gva_system
+
+
+# ══════════════════════════════════════════════════════════════════
+#  Módulos de hardware e infraestructura, importados bajo demanda
+# ══════════════════════════════════════════════════════════════════
+# La recolección de tests no los ejecuta: se importan la primera vez que
+# un test los pide como fixture.
+
+@pytest.fixture(scope="session")
+def hal_module():
+    """Módulo motor_hal."""
+    return importlib.import_module("motor_hal")
+
+
+@pytest.fixture(scope="session")
+def mqtt_module():
+    """Módulo mqtt_comm."""
+    return importlib.import_module("mqtt_comm")
+
+
+# ══════════════════════════════════════════════════════════════════
+#  asyncio.sleep instantáneo para toda la sesión
+# ══════════════════════════════════════════════════════════════════
+
+_real_sleep = asyncio.sleep
+
+
+async def _instant_sleep(delay, result=None):
+    """Sustituto de asyncio.sleep: no espera, pero cede el turno al loop
+    para conservar el orden entre tareas (p. ej. HAL antes que STATE)."""
+    await _real_sleep(0)
+    return result
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fast_sleep():
+    """Anula los delays simulados (relé, transición, broker, pasos) en toda la suite."""
+    asyncio.sleep = _instant_sleep
+    yield
+    asyncio.sleep = _real_sleep
+
+
+# ══════════════════════════════════════════════════════════════════
+#  Event loop de la suite (uvloop si está instalado)
+# ══════════════════════════════════════════════════════════════════
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Política que usa pytest-asyncio para crear los loops de los tests."""
+    if uvloop is not None:
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
@@ -10,91 +10,49 @@ Ejecutar:
 """
 
 import pytest
-import pytest_asyncio
 from unittest.mock import patch, AsyncMock, MagicMock
-import os
 
 import importlib
-import state_manager as sm_module
-import safety_orchestrator as orch_module
-import motor_hal as hal_module
-import mqtt_comm as mqtt_module
+import logging
+import re
 
 # Importar símbolos directamente desde los módulos fuente
-from state_manager import (
-    StateManager, SystemState, StateChangeResult,
-    InvalidStateTransitionError, VALID_TRANSITIONS,
-)
-from safety_orchestrator import (
-    SafetyOrchestrator, EmergencyStopResult, ResetResult,
-    OrchestratorBusyError, EmergencyStopFailedError,
-)
-from motor_hal import MotorHAL, RelayState
-from mqtt_comm  import MQTTComm, MQTTResult
+from state_manager import StateManager, SystemState
+from safety_orchestrator import SafetyOrchestrator
 
 
 # ══════════════════════════════════════════════════════════════════
 #  SUITE 1 — API pública exportada
 # ══════════════════════════════════════════════════════════════════
 
-class TestApiPublica:
-    """Verifica que todos los símbolos declarados en __all__ son importables."""
-
-    def test_state_manager_importable(self):
-        """TC-INIT-01: StateManager debe estar disponible."""
-        assert StateManager is not None
-
-    def test_system_state_importable(self):
-        """TC-INIT-02: SystemState debe estar disponible."""
-        assert SystemState is not None
-
-    def test_state_change_result_importable(self):
-        """TC-INIT-03: StateChangeResult debe estar disponible."""
-        assert StateChangeResult is not None
-
-    def test_invalid_state_transition_error_importable(self):
-        """TC-INIT-04: InvalidStateTransitionError debe estar disponible."""
-        assert InvalidStateTransitionError is not None
-
-    def test_valid_transitions_importable(self):
-        """TC-INIT-05: VALID_TRANSITIONS debe estar disponible."""
-        assert VALID_TRANSITIONS is not None
-
-    def test_safety_orchestrator_importable(self):
-        """TC-INIT-06: SafetyOrchestrator debe estar disponible."""
-        assert SafetyOrchestrator is not None
-
-    def test_emergency_stop_result_importable(self):
-        """TC-INIT-07: EmergencyStopResult debe estar disponible."""
-        assert EmergencyStopResult is not None
-
-    def test_reset_result_importable(self):
-        """TC-INIT-08: ResetResult debe estar disponible."""
-        assert ResetResult is not None
-
-    def test_orchestrator_busy_error_importable(self):
-        """TC-INIT-09: OrchestratorBusyError debe estar disponible."""
-        assert OrchestratorBusyError is not None
-
-    def test_emergency_stop_failed_error_importable(self):
-        """TC-INIT-10: EmergencyStopFailedError debe estar disponible."""
-        assert EmergencyStopFailedError is not None
+_SEMVER_RE = re.compile(r"^\d+\.\d+\.\d+$")
+
+# (símbolo, módulo fuente) de cada nombre declarado en __all__.
+_PUBLIC_SYMBOLS = [
+    ("StateManager",                "state_manager"),        # TC-INIT-01
+    ("SystemState",                 "state_manager"),        # TC-INIT-02
+    ("StateChangeResult",           "state_manager"),        # TC-INIT-03
+    ("InvalidStateTransitionError", "state_manager"),        # TC-INIT-04
+    ("VALID_TRANSITIONS",           "state_manager"),        # TC-INIT-05
+    ("SafetyOrchestrator",          "safety_orchestrator"),  # TC-INIT-06
+    ("EmergencyStopResult",         "safety_orchestrator"),  # TC-INIT-07
+    ("ResetResult",                 "safety_orchestrator"),  # TC-INIT-08
+    ("OrchestratorBusyError",       "safety_orchestrator"),  # TC-INIT-09
+    ("EmergencyStopFailedError",    "safety_orchestrator"),  # TC-INIT-10
+    ("MotorHAL",                    "motor_hal"),            # TC-INIT-11
+    ("RelayState",                  "motor_hal"),            # TC-INIT-12
+    ("MQTTComm",                    "mqtt_comm"),            # TC-INIT-13
+    ("MQTTResult",                  "mqtt_comm"),            # TC-INIT-14
+]
 
-    def test_motor_hal_importable(self):
-        """TC-INIT-11: MotorHAL debe estar disponible."""
-        assert MotorHAL is not None
 
-    def test_relay_state_importable(self):
-        """TC-INIT-12: RelayState debe estar disponible."""
-        assert RelayState is not None
-
-    def test_mqtt_comm_importable(self):
-        """TC-INIT-13: MQTTComm debe estar disponible."""
-        assert MQTTComm is not None
+class TestApiPublica:
+    """Verifica que todos los símbolos declarados en __all__ son importables."""
 
-    def test_mqtt_result_importable(self):
-        """TC-INIT-14: MQTTResult debe estar disponible."""
-        assert MQTTResult is not None
+    @pytest.mark.parametrize("name, module", _PUBLIC_SYMBOLS, ids=[n for n, _ in _PUBLIC_SYMBOLS])
+    def test_simbolo_importable(self, name, module):
+        """TC-INIT-01..14: Cada símbolo público debe estar disponible en su módulo."""
+        assert getattr(importlib.import_module(module), name, None) is not None, name
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -104,49 +62,40 @@ class TestApiPublica:
 class TestMetadatos:
     """Verifica las constantes de versión y configuración del paquete."""
 
-    def _get_init_module(self):
-        import importlib.util
-        init_path = os.path.join(os.path.dirname(__file__), '..', 'gva', '__init__.py')
-        spec = importlib.util.spec_from_file_location("gva_init", init_path)
-        mod  = importlib.util.module_from_spec(spec)
-        # patch imports para evitar dependencias circulares en el test
-        with patch.dict('sys.modules', {
-            'state_manager':       sm_module,
-            'safety_orchestrator': orch_module,
-            'motor_hal':           hal_module,
-            'mqtt_comm':           mqtt_module,
-        }):
-            spec.loader.exec_module(mod)
-        return mod
-
-    def test_version_definida(self):
+    def test_version_definida(self, gva_init_module):
         """TC-INIT-15: __version__ debe estar definida y ser string."""
-        mod = self._get_init_module()
-        assert isinstance(mod.__version__, str)
-        assert len(mod.__version__) > 0
+        assert isinstance(gva_init_module.__version__, str)
+        assert len(gva_init_module.__version__) > 0
 
-    def test_version_formato_semver(self):
+    def test_version_formato_semver(self, gva_init_module):
         """TC-INIT-16: __version__ debe seguir formato semver X.Y.Z."""
-        mod = self._get_init_module()
-        partes = mod.__version__.split(".")
-        assert len(partes) == 3
-        assert all(p.isdigit() for p in partes)
+        assert _SEMVER_RE.match(gva_init_module.__version__)
 
-    def test_unit_id_definido(self):
+    def test_unit_id_definido(self, gva_init_module):
         """TC-INIT-17: __unit__ debe ser 'GVA-07'."""
-        mod = self._get_init_module()
-        assert mod.__unit__ == "GVA-07"
+        assert gva_init_module.__unit__ == "GVA-07"
 
-    def test_sector_definido(self):
+    def test_sector_definido(self, gva_init_module):
         """TC-INIT-18: __sector__ debe ser 'ALMACÉN-3'."""
-        mod = self._get_init_module()
-        assert mod.__sector__ == "ALMACÉN-3"
+        assert gva_init_module.__sector__ == "ALMACÉN-3"
 
-    def test_author_definido(self):
+    def test_author_definido(self, gva_init_module):
         """TC-INIT-19: __author__ debe estar definido."""
-        mod = self._get_init_module()
-        assert isinstance(mod.__author__, str)
-        assert len(mod.__author__) > 0
+        assert isinstance(gva_init_module.__author__, str)
+        assert len(gva_init_module.__author__) > 0
+
+    def test_simbolos_se_cargan_bajo_demanda(self, gva_init_module):
+        """TC-INIT-39: Los símbolos de __all__ se resuelven al accederlos."""
+        vars(gva_init_module).pop("StateManager", None)   # módulo compartido: partir sin cargar
+        assert "StateManager" not in vars(gva_init_module)
+        assert gva_init_module.StateManager is StateManager
+        assert "StateManager" in vars(gva_init_module)    # queda cacheado tras el primer acceso
+        assert all(hasattr(gva_init_module, name) for name in gva_init_module.__all__)
+
+    def test_atributo_inexistente_lanza_attribute_error(self, gva_init_module):
+        """TC-INIT-40: Un nombre fuera de la API pública lanza AttributeError."""
+        with pytest.raises(AttributeError):
+            gva_init_module.NoExiste
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -156,63 +105,73 @@ class TestMetadatos:
 class TestFactory:
     """Verifica la factory helper que construye el sistema completo."""
 
-    def _get_factory(self):
-        import importlib.util
-        init_path = os.path.join(os.path.dirname(__file__), '..', 'gva', '__init__.py')
-        spec = importlib.util.spec_from_file_location("gva_init", init_path)
-        mod  = importlib.util.module_from_spec(spec)
-        with patch.dict('sys.modules', {
-            'state_manager':       sm_module,
-            'safety_orchestrator': orch_module,
-            'motor_hal':           hal_module,
-            'mqtt_comm':           mqtt_module,
-        }):
-            spec.loader.exec_module(mod)
-        return mod.create_gva_system
-
-    def test_factory_retorna_safety_orchestrator(self):
+    def test_factory_retorna_safety_orchestrator(self, gva_factory):
         """TC-INIT-20: create_gva_system() debe retornar un SafetyOrchestrator."""
-        factory = self._get_factory()
-        orch = factory()
+        orch = gva_factory()
         assert isinstance(orch, SafetyOrchestrator)
 
-    def test_factory_is_running_false_al_inicio(self):
+    def test_factory_is_running_false_al_inicio(self, gva_factory):
         """TC-INIT-21: El orquestador creado debe tener is_running=False."""
-        factory = self._get_factory()
-        orch = factory()
+        orch = gva_factory()
         assert orch.is_running is False
 
-    def test_factory_last_result_none_al_inicio(self):
+    def test_factory_last_result_none_al_inicio(self, gva_factory):
         """TC-INIT-22: El orquestador creado debe tener last_result=None."""
-        factory = self._get_factory()
-        orch = factory()
+        orch = gva_factory()
         assert orch.last_result is None
 
-    def test_factory_acepta_broker_url_personalizado(self):
+    def test_factory_acepta_broker_url_personalizado(self, gva_factory):
         """TC-INIT-23: La factory debe aceptar broker_url personalizado."""
-        factory = self._get_factory()
-        orch = factory(broker_url="mqtt://custom-broker:1883")
+        orch = gva_factory(broker_url="mqtt://custom-broker:1883")
         assert isinstance(orch, SafetyOrchestrator)
 
-    def test_factory_acepta_unit_id_personalizado(self):
+    def test_factory_acepta_unit_id_personalizado(self, gva_factory):
         """TC-INIT-24: La factory debe aceptar unit_id personalizado."""
-        factory = self._get_factory()
-        orch = factory(unit_id="GVA-99")
+        orch = gva_factory(unit_id="GVA-99")
         assert isinstance(orch, SafetyOrchestrator)
 
-    def test_factory_acepta_sector_personalizado(self):
+    def test_factory_acepta_sector_personalizado(self, gva_factory):
         """TC-INIT-25: La factory debe aceptar sector personalizado."""
-        factory = self._get_factory()
-        orch = factory(sector="ALMACÉN-7")
+        orch = gva_factory(sector="ALMACÉN-7")
         assert isinstance(orch, SafetyOrchestrator)
 
-    def test_factory_crea_instancias_independientes(self):
+    def test_factory_crea_instancias_independientes(self, gva_factory):
         """TC-INIT-26: Dos llamadas a la factory deben crear instancias distintas."""
-        factory = self._get_factory()
-        orch1 = factory()
-        orch2 = factory()
+        orch1 = gva_factory()
+        orch2 = gva_factory()
         assert orch1 is not orch2
 
+    def test_factory_acepta_simulate_latency(self, gva_factory):
+        """TC-INIT-37: La factory acepta simulate_latency=False."""
+        orch = gva_factory(simulate_latency=False)
+        assert isinstance(orch, SafetyOrchestrator)
+
+    def test_factory_log_level_configura_formatter_iso(self, gva_factory):
+        """TC-INIT-41: log_level configura el logging raíz con IsoTimeFormatter."""
+        from clock import IsoTimeFormatter
+        with patch("logging.basicConfig") as basic_config:
+            gva_factory(log_level=logging.INFO)
+        kwargs = basic_config.call_args.kwargs
+        assert kwargs["level"] == logging.INFO
+        assert isinstance(kwargs["handlers"][0].formatter, IsoTimeFormatter)
+
+    def test_factory_use_uvloop_instala_politica(self, gva_factory):
+        """TC-INIT-33: use_uvloop=True instala la política de uvloop."""
+        fake_uvloop = MagicMock()
+        with patch.dict('sys.modules', {'uvloop': fake_uvloop}), \
+             patch("asyncio.set_event_loop_policy") as set_policy:
+            orch = gva_factory(use_uvloop=True)
+        set_policy.assert_called_once_with(fake_uvloop.EventLoopPolicy.return_value)
+        assert isinstance(orch, SafetyOrchestrator)
+
+    def test_factory_use_uvloop_sin_uvloop_instalado(self, gva_factory):
+        """TC-INIT-34: Sin uvloop instalado, la factory usa el loop estándar."""
+        with patch.dict('sys.modules', {'uvloop': None}), \
+             patch("asyncio.set_event_loop_policy") as set_policy:
+            orch = gva_factory(use_uvloop=True)
+        set_policy.assert_not_called()
+        assert isinstance(orch, SafetyOrchestrator)
+
 
 # ══════════════════════════════════════════════════════════════════
 #  SUITE 4 — Integración superficial (sin mocks)
@@ -225,42 +184,164 @@ class TestIntegracionSuperficial:
     pero con delays anulados vía monkeypatching de asyncio.sleep.
     """
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_state_manager_real_transicion_emergency(self):
         """TC-INIT-27: StateManager real puede transicionar a EMERGENCY_STOP."""
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            m = StateManager()
-            result = await m.cambiar_estado(SystemState.EMERGENCY_STOP)
+        m = StateManager()
+        result = await m.cambiar_estado(SystemState.EMERGENCY_STOP)
         assert result.status == "OK"
         assert m.current_state == SystemState.EMERGENCY_STOP
 
-    @pytest.mark.asyncio
-    async def test_motor_hal_real_cortar_energia(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_motor_hal_real_cortar_energia(self, hal_module):
         """TC-INIT-28: MotorHAL real puede cortar la energía."""
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            hal = MotorHAL()
-            result = await hal.cortar_energia()
+        hal = hal_module.MotorHAL()
+        result = await hal.cortar_energia()
         assert result["status"] == "OK"
         assert result["relay"] == "OPEN"
 
-    @pytest.mark.asyncio
-    async def test_mqtt_comm_real_publish(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    @pytest.mark.parametrize("method", ["cortar_energia", "restaurar_energia"])
+    async def test_motor_hal_real_respeta_min_complete_at(self, hal_module, method):
+        """TC-INIT-47: El relé espera hasta min_complete_at si es posterior a su propio delay."""
+        import asyncio
+        hal = hal_module.MotorHAL()
+        operar = getattr(hal, method)
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await operar(min_complete_at=asyncio.get_running_loop().time() + 1.0)
+            await operar(min_complete_at=asyncio.get_running_loop().time())
+        (largo,), (propio,) = (c.args for c in sleep.await_args_list)
+        assert largo == pytest.approx(1.0, abs=0.05)
+        assert propio == hal_module.MotorHAL.RELAY_OPEN_DELAY_MS / 1000
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mqtt_comm_real_publish(self, mqtt_module):
         """TC-INIT-29: MQTTComm real puede publicar un mensaje."""
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            mqtt = MQTTComm()
-            result = await mqtt.publish("test/topic", {"event": "TEST"})
+        mqtt = mqtt_module.MQTTComm()
+        result = await mqtt.publish("test/topic", {"event": "TEST"})
         assert result["status"] == "OK"
         assert result["topic"] == "test/topic"
 
-    @pytest.mark.asyncio
-    async def test_sistema_completo_trigger_con_delays_anulados(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mqtt_comm_real_packet_json_utf8(self, mqtt_module):
+        """TC-INIT-32: El paquete es JSON válido y conserva caracteres no ASCII."""
+        import json
+        mqtt = mqtt_module.MQTTComm(sector="ALMACÉN-3")
+        result = await mqtt.publish("test/topic", {"event": "TEST"})
+        assert "ALMACÉN-3" in result["packet"]
+        assert json.loads(result["packet"])["sector"] == "ALMACÉN-3"
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mqtt_comm_real_payload_solo_en_debug(self, mqtt_module, caplog):
+        """TC-INIT-35: El payload no se registra en nivel WARNING."""
+        caplog.set_level("WARNING", logger="mqtt_comm")
+        mqtt = mqtt_module.MQTTComm()
+        await mqtt.publish("test/topic", {"event": "TEST"})
+        assert caplog.records == []
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mqtt_comm_real_payload_debug_es_texto(self, mqtt_module, caplog):
+        """TC-INIT-45: En DEBUG el payload se registra como texto JSON, no como bytes."""
+        caplog.set_level("DEBUG", logger="mqtt_comm")
+        mqtt = mqtt_module.MQTTComm(sector="ALMACÉN-3")
+        await mqtt.publish("test/topic", {"event": "TEST"})
+        payloads = [r.getMessage() for r in caplog.records if "Payload" in r.getMessage()]
+        assert len(payloads) == 1
+        assert "ALMACÉN-3" in payloads[0]
+        assert "b'" not in payloads[0]
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mqtt_comm_real_reutiliza_conexion(self, mqtt_module):
+        """TC-INIT-31: MQTTComm conecta una sola vez para varias publicaciones."""
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            mqtt = mqtt_module.MQTTComm()
+            await mqtt.publish("test/topic", {"event": "A"})
+            await mqtt.publish("test/topic", {"event": "B"})
+        assert mqtt.is_connected is True
+        sleep.assert_awaited_once_with(mqtt_module.MQTTComm.CONNECT_DELAY_MS / 1000)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mqtt_comm_real_conexion_concurrente_un_solo_handshake(self, mqtt_module, caplog):
+        """TC-INIT-44: Publicaciones concurrentes comparten un único handshake."""
+        import asyncio
+        caplog.set_level("INFO", logger="mqtt_comm")
+        with patch.object(mqtt_module.MQTTComm, "CONNECT_DELAY_MS", 10):
+            mqtt = mqtt_module.MQTTComm()
+            await asyncio.gather(
+                mqtt.publish("test/topic", {"event": "A"}),
+                mqtt.publish("test/topic", {"event": "B"}),
+                mqtt.connect(),
+            )
+        conexiones = [r for r in caplog.records if "Conectando" in r.getMessage()]
+        assert len(conexiones) == 1
+
+    def test_iso_time_formatter_reutiliza_prefijo_por_segundo(self):
+        """TC-INIT-42: IsoTimeFormatter llama a strftime una vez por segundo y agrega los ms."""
+        import time
+        from clock import IsoTimeFormatter
+        fmt = IsoTimeFormatter("%(asctime)s")
+        rec_a = logging.makeLogRecord({"created": 1_767_225_600.125, "msecs": 125})
+        rec_b = logging.makeLogRecord({"created": 1_767_225_600.750, "msecs": 750})
+        rec_c = logging.makeLogRecord({"created": 1_767_225_601.004, "msecs": 4})
+        with patch("time.strftime", wraps=time.strftime) as strftime:
+            ts_a, ts_b = fmt.format(rec_a), fmt.format(rec_b)
+            assert strftime.call_count == 1
+            ts_c = fmt.format(rec_c)
+            assert strftime.call_count == 2
+        assert ts_a[:19] == ts_b[:19] != ts_c[:19]
+        assert "T" in ts_a
+        assert ts_a.endswith(".125") and ts_b.endswith(".750") and ts_c.endswith(".004")
+
+    def test_iso_from_ns_coincide_con_datetime(self):
+        """TC-INIT-43: iso_from_ns (con caché por segundo) equivale a datetime.isoformat()."""
+        from datetime import datetime, timezone
+        from clock import iso_from_ns
+        base = 1_767_225_600 * 10**9
+        for ns in (base + 125_000_000, base + 999_999_999, base + 10**9, base + 10**9 + 1_000):
+            expected = datetime.fromtimestamp(ns // 10**9, tz=timezone.utc).replace(
+                microsecond=ns % 10**9 // 1000
+            ).isoformat(timespec="microseconds")
+            assert iso_from_ns(ns) == expected
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_delay_until_toma_la_espera_mayor(self):
+        """TC-INIT-48: delay_until devuelve la latencia propia o la espera hasta el deadline, la mayor."""
+        import asyncio
+        from clock import delay_until
+        ahora = asyncio.get_running_loop().time()
+        assert delay_until(0.35, None) == 0.35
+        assert delay_until(0.35, ahora - 1.0) == 0.35
+        assert delay_until(0.0, ahora + 1.0) == pytest.approx(1.0, abs=0.05)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_colaboradores_sin_latencia_simulada(self, hal_module, mqtt_module):
+        """TC-INIT-36: Con simulate_latency=False no se espera ningún delay."""
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await hal_module.MotorHAL(simulate_latency=False).cortar_energia()
+            await StateManager(simulate_latency=False).cambiar_estado(
+                SystemState.EMERGENCY_STOP
+            )
+            await mqtt_module.MQTTComm(simulate_latency=False).publish("test/topic", {})
+        assert all(c.args == (0.0,) for c in sleep.await_args_list)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_factory_sin_latencia_anula_delays_del_orquestador(self, gva_factory):
+        """TC-INIT-46: create_gva_system(simulate_latency=False) no espera en trigger() ni reset()."""
+        orch = gva_factory(simulate_latency=False)
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await orch.trigger()
+            await orch.reset()
+        assert sleep.await_args_list
+        assert all(c.args[0] == 0.0 for c in sleep.await_args_list)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_sistema_completo_trigger_con_delays_anulados(self, hal_module, mqtt_module):
         """TC-INIT-30: Sistema completo ejecuta trigger() con delays=0."""
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            hal   = MotorHAL()
-            state = StateManager()
-            mqtt  = MQTTComm()
-            orch  = SafetyOrchestrator(hal, state, mqtt)
-            result = await orch.trigger()
+        hal   = hal_module.MotorHAL()
+        state = StateManager()
+        mqtt  = mqtt_module.MQTTComm()
+        orch  = SafetyOrchestrator(hal, state, mqtt)
+        result = await orch.trigger()
 
         assert result.status == "OK"
         assert result.hal_result["relay"] == "OPEN"
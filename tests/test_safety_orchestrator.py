@@ -9,12 +9,12 @@ Ejecutar:
     pytest test_safety_orchestrator.py -v
 """
 
+import asyncio
+
 import pytest
-import pytest_asyncio
-from unittest.mock import AsyncMock, MagicMock, patch, call
-from dataclasses import dataclass
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
-from state_manager import StateManager, SystemState, StateChangeResult
+from state_manager import SystemState, StateChangeResult
 from safety_orchestrator import (
     SafetyOrchestrator,
     EmergencyStopResult,
@@ -28,58 +28,136 @@ from safety_orchestrator import (
 #  HELPERS — Mocks reutilizables
 # ══════════════════════════════════════════════════════════════════
 
-def make_hal_mock(relay="OPEN", status="OK"):
+# Resultados OK precalculados (StateChangeResult es inmutable: se comparten).
+_STATE_OK_EMERGENCY = StateChangeResult("OK", SystemState.EMERGENCY_STOP, SystemState.NORMAL)
+_STATE_OK_RESTORED  = StateChangeResult("OK", SystemState.NORMAL, SystemState.RESTORING)
+
+
+def _state_ok(s):
+    """StateChangeResult OK hacia `s`; el caso habitual devuelve la instancia cacheada."""
+    if s == SystemState.EMERGENCY_STOP:
+        return _STATE_OK_EMERGENCY
+    return StateChangeResult("OK", s, SystemState.NORMAL)
+
+
+# Respuestas canónicas de los mocks (compartidas: ningún test las modifica).
+_HAL_OPEN_OK   = {"status": "OK", "relay": "OPEN", "unit_id": "GVA-07"}
+_HAL_CLOSED_OK = {"status": "OK", "relay": "CLOSED"}
+_MQTT_OK       = {"status": "OK", "topic": "gva/07/safety/emergency", "packet": "{}"}
+
+
+def make_hal_mock():
     """Crea un mock de MotorHAL que retorna un dict correcto."""
     hal = MagicMock()
-    hal.cortar_energia = AsyncMock(return_value={
-        "status": status,
-        "relay":  relay,
-        "unit_id": "GVA-07",
-    })
-    hal.restaurar_energia = AsyncMock(return_value={
-        "status": "OK",
-        "relay":  "CLOSED",
-    })
+    hal.cortar_energia = AsyncMock(return_value=_HAL_OPEN_OK)
+    hal.restaurar_energia = AsyncMock(return_value=_HAL_CLOSED_OK)
     return hal
 
 
-def make_mqtt_mock(status="OK"):
+def make_mqtt_mock():
     """Crea un mock de MQTTComm que retorna un dict correcto."""
     mqtt = MagicMock()
-    mqtt.publish = AsyncMock(return_value={
-        "status": status,
-        "topic":  "gva/07/safety/emergency",
-        "packet": "{}",
-    })
+    mqtt.connect = AsyncMock(return_value=None)
+    mqtt.publish = AsyncMock(return_value=_MQTT_OK)
     return mqtt
 
 
+class _StateStub:
+    """Doble liviano de StateManager: solo lo que usa el orquestador, sin spec."""
+
+    def __init__(self):
+        self.current_state  = SystemState.NORMAL
+        self.cambiar_estado = AsyncMock(return_value=_STATE_OK_EMERGENCY)
+        self.restore        = AsyncMock(return_value=_STATE_OK_RESTORED)
+
+
 def make_state_mock():
-    """Crea un mock de StateManager."""
-    state = MagicMock(spec=StateManager)
-    state_result = StateChangeResult(
-        status="OK",
-        state=SystemState.EMERGENCY_STOP,
-        previous=SystemState.NORMAL,
-    )
-    state.cambiar_estado = AsyncMock(return_value=state_result)
-    state.current_state = SystemState.NORMAL
-    return state
+    """Crea un doble de StateManager."""
+    return _StateStub()
 
 
-@pytest.fixture
+def _force_state(orch, running, last_result=None):
+    """Fija el estado interno del orquestador sin pasar por trigger()/reset()."""
+    object.__setattr__(orch, "_running", running)
+    object.__setattr__(orch, "_last_result", last_result)
+
+
+# Atributos de cada mock (hal, state, mqtt) que los tests pueden reemplazar.
+_MOCK_ATTRS = (
+    ("cortar_energia", "restaurar_energia"),
+    ("cambiar_estado", "restore", "current_state"),
+    ("connect", "publish"),
+)
+
+
+@pytest.fixture(scope="module")
 def deps():
     """Devuelve las tres dependencias mockeadas listas para inyectar."""
     return make_hal_mock(), make_state_mock(), make_mqtt_mock()
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def orch(deps):
     """SafetyOrchestrator con dependencias mockeadas."""
     hal, state, mqtt = deps
     return SafetyOrchestrator(hal, state, mqtt)
 
 
+@pytest.fixture(autouse=True)
+def _reset(deps, orch):
+    """
+    deps/orch se comparten en el módulo: tras cada test se restauran los
+    mocks originales (con sus llamadas borradas) y el estado del orquestador.
+    """
+    originales = [
+        {name: getattr(mock, name) for name in attrs}
+        for mock, attrs in zip(deps, _MOCK_ATTRS)
+    ]
+    yield
+    for mock, attrs in zip(deps, originales):
+        for name, original in attrs.items():
+            setattr(mock, name, original)
+            if isinstance(original, Mock):
+                original.reset_mock(side_effect=True)
+    _force_state(orch, running=False)
+
+
+# Fakes que registran el orden en que el orquestador invoca cada capa.
+_call_order: list = []
+
+
+async def _hal_fn():
+    _call_order.append("HAL")
+    return {"status": "OK", "relay": "OPEN"}
+
+
+async def _state_fn(s, **_):
+    _call_order.append("STATE")
+    return _state_ok(s)
+
+
+async def _mqtt_fn(t, p, **_):
+    _call_order.append("MQTT")
+    return {"status": "OK", "topic": t, "packet": "{}"}
+
+
+@pytest.fixture
+def call_order_orch(deps):
+    """Orquestador cuyas dependencias anotan su invocación en una lista compartida."""
+    hal, state, mqtt = deps
+    _call_order.clear()
+    hal.cortar_energia   = _hal_fn
+    state.cambiar_estado = _state_fn
+    mqtt.publish         = _mqtt_fn
+    return SafetyOrchestrator(hal, state, mqtt), _call_order
+
+
+@pytest.fixture(scope="module")
+async def trigger_result(orch):
+    """EmergencyStopResult de un único trigger() compartido por los tests de solo lectura."""
+    return await orch.trigger()
+
+
 # ══════════════════════════════════════════════════════════════════
 #  SUITE 1 — Estado inicial del orquestador
 # ══════════════════════════════════════════════════════════════════
@@ -109,82 +187,75 @@ class TestEstadoInicial:
 
 class TestTriggerSecuencia:
 
-    @pytest.mark.asyncio
-    async def test_trigger_llama_hal_primero(self, orch, deps):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_trigger_llama_hal_primero(self, call_order_orch):
         """TC-ORCH-05: cortar_energia() debe ser el primer paso llamado."""
-        hal, state, mqtt = deps
-        call_order = []
-        hal.cortar_energia.side_effect    = lambda: call_order.append("HAL")   or {"status":"OK","relay":"OPEN"}
-        state.cambiar_estado.side_effect  = lambda s: call_order.append("STATE") or StateChangeResult("OK", s, SystemState.NORMAL)
-        mqtt.publish.side_effect          = lambda t, p: call_order.append("MQTT") or {"status":"OK","topic":t,"packet":"{}"}
-
-        # Redefinir como AsyncMock con side_effect
-        async def hal_fn():   call_order.append("HAL");   return {"status":"OK","relay":"OPEN"}
-        async def state_fn(s): call_order.append("STATE"); return StateChangeResult("OK", s, SystemState.NORMAL)
-        async def mqtt_fn(t,p): call_order.append("MQTT"); return {"status":"OK","topic":t,"packet":"{}"}
-
-        hal.cortar_energia   = hal_fn
-        state.cambiar_estado = state_fn
-        mqtt.publish         = mqtt_fn
-
+        orch, call_order = call_order_orch
         await orch.trigger()
         assert call_order[0] == "HAL"
 
-    @pytest.mark.asyncio
-    async def test_trigger_orden_hal_state_mqtt(self, deps):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_trigger_orden_hal_state_mqtt(self, call_order_orch):
         """TC-ORCH-06: El orden de ejecución debe ser HAL → STATE → MQTT."""
-        hal, state, mqtt = deps
-        call_order = []
-
-        async def hal_fn():    call_order.append("HAL");   return {"status":"OK","relay":"OPEN"}
-        async def state_fn(s): call_order.append("STATE"); return StateChangeResult("OK", s, SystemState.NORMAL)
-        async def mqtt_fn(t,p):call_order.append("MQTT");  return {"status":"OK","topic":t,"packet":"{}"}
-
-        hal.cortar_energia   = hal_fn
-        state.cambiar_estado = state_fn
-        mqtt.publish         = mqtt_fn
-
-        orch = SafetyOrchestrator(hal, state, mqtt)
+        orch, call_order = call_order_orch
         await orch.trigger()
         assert call_order == ["HAL", "STATE", "MQTT"]
 
-    @pytest.mark.asyncio
-    async def test_trigger_retorna_result_con_status_ok(self, orch):
+    def test_trigger_retorna_result_con_status_ok(self, trigger_result):
         """TC-ORCH-07: trigger() debe retornar EmergencyStopResult con status OK."""
-        result = await orch.trigger()
-        assert result.status == "OK"
+        assert trigger_result.status == "OK"
 
-    @pytest.mark.asyncio
-    async def test_trigger_retorna_emergency_stop_result(self, orch):
+    def test_trigger_retorna_emergency_stop_result(self, trigger_result):
         """TC-ORCH-08: El tipo de retorno debe ser EmergencyStopResult."""
-        result = await orch.trigger()
-        assert isinstance(result, EmergencyStopResult)
+        assert isinstance(trigger_result, EmergencyStopResult)
 
-    @pytest.mark.asyncio
-    async def test_trigger_result_contiene_hal_result(self, orch):
+    def test_trigger_result_contiene_hal_result(self, trigger_result):
         """TC-ORCH-09: El resultado debe incluir el retorno del HAL."""
-        result = await orch.trigger()
-        assert result.hal_result["relay"] == "OPEN"
+        assert trigger_result.hal_result["relay"] == "OPEN"
 
-    @pytest.mark.asyncio
-    async def test_trigger_result_contiene_state_result(self, orch):
+    def test_trigger_result_contiene_state_result(self, trigger_result):
         """TC-ORCH-10: El resultado debe incluir el retorno del StateManager."""
-        result = await orch.trigger()
-        assert result.state_result.state == SystemState.EMERGENCY_STOP
+        assert trigger_result.state_result.state == SystemState.EMERGENCY_STOP
 
-    @pytest.mark.asyncio
-    async def test_trigger_result_contiene_mqtt_result(self, orch):
+    def test_trigger_result_contiene_mqtt_result(self, trigger_result):
         """TC-ORCH-11: El resultado debe incluir el retorno de MQTTComm."""
-        result = await orch.trigger()
-        assert result.mqtt_result["status"] == "OK"
+        assert trigger_result.mqtt_result["status"] == "OK"
 
-    @pytest.mark.asyncio
-    async def test_trigger_result_tiene_duration_ms(self, orch):
+    def test_trigger_result_tiene_duration_ms(self, trigger_result):
         """TC-ORCH-12: El resultado debe incluir la duración en ms."""
-        result = await orch.trigger()
-        assert result.duration_ms > 0
+        assert trigger_result.duration_ms > 0
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_trigger_pasa_deadline_a_los_pasos(self, orch, deps):
+        """TC-ORCH-35: El delay entre pasos se delega como min_complete_at."""
+        _, _, mqtt = deps
+        await orch.trigger()
+        deadline = mqtt.publish.call_args.kwargs["min_complete_at"]
+        restante = deadline - asyncio.get_running_loop().time()
+        assert restante == pytest.approx(orch.STEP_DELAY_MS / 1000, abs=0.05)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_trigger_espera_post_stop_delay(self, orch):
+        """TC-ORCH-44: Tras publicar, trigger() espera POST_STOP_DELAY_MS antes de reportar."""
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await orch.trigger()
+        assert sleep.await_args_list[-1].args == (orch.POST_STOP_DELAY_MS / 1000,)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_trigger_duration_ms_resolucion_submilisegundo(self, orch):
+        """TC-ORCH-46: duration_ms se mide con perf_counter y conserva fracciones de ms."""
+        with patch("time.perf_counter", side_effect=[10.0, 10.0004]):
+            result = await orch.trigger()
+        assert result.duration_ms == 0.4
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_trigger_conecta_mqtt_en_paralelo(self, orch, deps):
+        """TC-ORCH-36: La conexión al broker se abre durante el corte de energía."""
+        _, _, mqtt = deps
+        await orch.trigger()
+        mqtt.connect.assert_awaited_once()
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_trigger_almacena_last_result(self, orch):
         """TC-ORCH-13: Tras trigger(), last_result no debe ser None."""
         await orch.trigger()
@@ -198,24 +269,35 @@ class TestTriggerSecuencia:
 
 class TestGuardClause:
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_trigger_lanza_busy_si_ya_running(self, orch):
         """TC-ORCH-14: Segundo trigger() lanza OrchestratorBusyError."""
-        orch._running = True
+        _force_state(orch, running=True)
         with pytest.raises(OrchestratorBusyError) as exc:
             await orch.trigger()
         assert "ejecutando" in str(exc.value).lower() or "busy" in str(exc.value).lower()
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_hal_no_llamado_si_ya_running(self, orch, deps):
         """TC-ORCH-15: Si ya running, cortar_energia() no debe invocarse."""
         hal, _, _ = deps
-        orch._running = True
+        _force_state(orch, running=True)
         with pytest.raises(OrchestratorBusyError):
             await orch.trigger()
         hal.cortar_energia.assert_not_called()
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_triggers_concurrentes_solo_uno_ejecuta(self, orch, deps):
+        """TC-ORCH-38: De dos trigger() concurrentes, solo uno ejecuta la secuencia."""
+        hal, _, _ = deps
+        results = await asyncio.gather(
+            orch.trigger(), orch.trigger(), return_exceptions=True,
+        )
+        busy = [r for r in results if isinstance(r, OrchestratorBusyError)]
+        assert len(busy) == 1
+        hal.cortar_energia.assert_called_once()
+
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_is_running_true_durante_ejecucion(self, deps):
         """TC-ORCH-16: is_running debe ser True mientras trigger() ejecuta."""
         hal, state, mqtt = deps
@@ -230,7 +312,7 @@ class TestGuardClause:
         await orch.trigger()
         assert running_during[0] is True
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_is_running_true_tras_trigger(self, orch):
         """TC-ORCH-17: is_running queda True tras trigger() (requiere reset manual)."""
         await orch.trigger()
@@ -241,47 +323,28 @@ class TestGuardClause:
 #  SUITE 4 — Payload MQTT
 # ══════════════════════════════════════════════════════════════════
 
-class TestPayloadMQTT:
+@pytest.fixture(scope="module")
+async def trigger_payload(orch, deps):
+    """(topic, payload) del publish de un único trigger() compartido por la suite."""
+    await orch.trigger()
+    return deps[2].publish.call_args[0]
 
-    @pytest.mark.asyncio
-    async def test_mqtt_publish_llamado_con_topic_correcto(self, orch, deps):
-        """TC-ORCH-18: publish() debe llamarse con el topic de emergencia."""
-        _, _, mqtt = deps
-        await orch.trigger()
-        call_args = mqtt.publish.call_args
-        assert call_args[0][0] == "gva/07/safety/emergency"
 
-    @pytest.mark.asyncio
-    async def test_mqtt_payload_contiene_event_emergency_stop(self, orch, deps):
-        """TC-ORCH-19: El payload debe incluir event=EMERGENCY_STOP."""
-        _, _, mqtt = deps
-        await orch.trigger()
-        payload = mqtt.publish.call_args[0][1]
-        assert payload["event"] == "EMERGENCY_STOP"
+class TestPayloadMQTT:
 
-    @pytest.mark.asyncio
-    async def test_mqtt_payload_contiene_trigger_manual(self, orch, deps):
-        """TC-ORCH-20: El payload debe indicar el trigger MANUAL_BUTTON."""
-        _, _, mqtt = deps
-        await orch.trigger()
-        payload = mqtt.publish.call_args[0][1]
-        assert payload["trigger"] == "MANUAL_BUTTON"
+    def test_mqtt_publish_llamado_con_topic_correcto(self, trigger_payload):
+        """TC-ORCH-18: publish() debe llamarse con el topic de emergencia."""
+        assert trigger_payload[0] == "gva/07/safety/emergency"
 
-    @pytest.mark.asyncio
-    async def test_mqtt_payload_contiene_hal_status(self, orch, deps):
-        """TC-ORCH-21: El payload debe incluir el estado del relé del HAL."""
-        _, _, mqtt = deps
-        await orch.trigger()
-        payload = mqtt.publish.call_args[0][1]
-        assert payload["hal_status"] == "OPEN"
-
-    @pytest.mark.asyncio
-    async def test_mqtt_payload_contiene_state(self, orch, deps):
-        """TC-ORCH-22: El payload debe incluir el nuevo estado del sistema."""
-        _, _, mqtt = deps
-        await orch.trigger()
-        payload = mqtt.publish.call_args[0][1]
-        assert payload["state"] == "EMERGENCY_STOP"
+    @pytest.mark.parametrize("key, expected", [
+        pytest.param("event",      "EMERGENCY_STOP", id="event"),
+        pytest.param("trigger",    "MANUAL_BUTTON",  id="trigger"),
+        pytest.param("hal_status", "OPEN",           id="hal_status"),
+        pytest.param("state",      "EMERGENCY_STOP", id="state"),
+    ])
+    def test_mqtt_payload_contiene(self, trigger_payload, key, expected):
+        """TC-ORCH-19..22: El payload debe incluir evento, trigger, estado del relé y estado."""
+        assert trigger_payload[1][key] == expected
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -290,51 +353,90 @@ class TestPayloadMQTT:
 
 class TestManejoErrores:
 
-    @pytest.mark.asyncio
-    async def test_fallo_en_hal_lanza_emergency_stop_failed(self, deps):
-        """TC-ORCH-23: Si HAL falla, debe lanzar EmergencyStopFailedError."""
-        hal, state, mqtt = deps
-        hal.cortar_energia = AsyncMock(side_effect=RuntimeError("GPIO error"))
-        orch = SafetyOrchestrator(hal, state, mqtt)
+    @pytest.mark.asyncio(loop_scope="session")
+    @pytest.mark.parametrize("which, method, exc_cls, msg", [
+        pytest.param("hal",   "cortar_energia", RuntimeError,    "GPIO error",           id="hal"),
+        pytest.param("state", "cambiar_estado", ValueError,      "Estado inválido",      id="state"),
+        pytest.param("mqtt",  "publish",        ConnectionError, "Broker no disponible", id="mqtt"),
+    ])
+    async def test_fallo_en_paso_lanza_emergency_stop_failed(
+        self, deps, orch, which, method, exc_cls, msg,
+    ):
+        """TC-ORCH-23/24/25: Si HAL, StateManager o MQTT fallan, debe lanzar EmergencyStopFailedError."""
+        mock = deps[("hal", "state", "mqtt").index(which)]
+        setattr(mock, method, AsyncMock(side_effect=exc_cls(msg)))
 
         with pytest.raises(EmergencyStopFailedError) as exc:
             await orch.trigger()
-        assert "GPIO error" in str(exc.value)
+        assert msg in str(exc.value)
 
-    @pytest.mark.asyncio
-    async def test_fallo_en_state_lanza_emergency_stop_failed(self, deps):
-        """TC-ORCH-24: Si StateManager falla, debe lanzar EmergencyStopFailedError."""
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_si_hal_falla_state_no_es_llamado(self, deps):
+        """TC-ORCH-26: Si HAL falla, StateManager no debe ser invocado."""
         hal, state, mqtt = deps
-        state.cambiar_estado = AsyncMock(side_effect=ValueError("Estado inválido"))
+        hal.cortar_energia = AsyncMock(side_effect=RuntimeError("HAL error"))
         orch = SafetyOrchestrator(hal, state, mqtt)
 
-        with pytest.raises(EmergencyStopFailedError) as exc:
+        with pytest.raises(EmergencyStopFailedError):
             await orch.trigger()
-        assert "Estado inválido" in str(exc.value)
+        state.cambiar_estado.assert_not_called()
 
-    @pytest.mark.asyncio
-    async def test_fallo_en_mqtt_lanza_emergency_stop_failed(self, deps):
-        """TC-ORCH-25: Si MQTT falla, debe lanzar EmergencyStopFailedError."""
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_si_state_falla_el_corte_de_hal_no_se_cancela(self, deps):
+        """TC-ORCH-37: Un fallo en StateManager no interrumpe el corte en curso."""
         hal, state, mqtt = deps
-        mqtt.publish = AsyncMock(side_effect=ConnectionError("Broker no disponible"))
+        relay = []
+        rele_opera = asyncio.Event()
+
+        async def hal_fn():
+            # El relé sigue operando hasta que el test lo libera; no depende
+            # de asyncio.sleep, que en la suite no espera.
+            await rele_opera.wait()
+            relay.append("OPEN")
+            return {"status": "OK", "relay": "OPEN"}
+
+        hal.cortar_energia = hal_fn
+        state.cambiar_estado = AsyncMock(side_effect=ValueError("Estado inválido"))
         orch = SafetyOrchestrator(hal, state, mqtt)
 
-        with pytest.raises(EmergencyStopFailedError) as exc:
-            await orch.trigger()
-        assert "Broker no disponible" in str(exc.value)
+        task = asyncio.ensure_future(orch.trigger())
+        while not state.cambiar_estado.await_count:
+            await asyncio.sleep(0)
+        for _ in range(5):   # el orquestador ya está esperando al relé
+            await asyncio.sleep(0)
+        assert not task.done()
 
-    @pytest.mark.asyncio
-    async def test_si_hal_falla_state_no_es_llamado(self, deps):
-        """TC-ORCH-26: Si HAL falla, StateManager no debe ser invocado."""
+        rele_opera.set()
+        with pytest.raises(EmergencyStopFailedError):
+            await task
+        assert relay == ["OPEN"]
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_fallo_de_hal_tras_fallo_de_state_se_reporta(self, deps, caplog):
+        """TC-ORCH-42: Si el corte falla después que el estado, ambos fallos se reportan."""
         hal, state, mqtt = deps
-        hal.cortar_energia = AsyncMock(side_effect=RuntimeError("HAL error"))
+        state_fallo = asyncio.Event()
+
+        async def hal_fn():
+            await state_fallo.wait()
+            raise RuntimeError("RELAY STUCK CLOSED")
+
+        async def state_fn(s, **_):
+            state_fallo.set()
+            raise ValueError("state boom")
+
+        hal.cortar_energia = hal_fn
+        state.cambiar_estado = state_fn
         orch = SafetyOrchestrator(hal, state, mqtt)
 
-        with pytest.raises(EmergencyStopFailedError):
+        with pytest.raises(EmergencyStopFailedError) as exc_info:
             await orch.trigger()
-        state.cambiar_estado.assert_not_called()
+        assert "state boom" in str(exc_info.value)
+        assert "RELAY STUCK CLOSED" in str(exc_info.value)
+        criticos = [r.getMessage() for r in caplog.records if r.levelname == "CRITICAL"]
+        assert any("RELAY STUCK CLOSED" in m for m in criticos)
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_emergency_stop_failed_encadena_causa_original(self, deps):
         """TC-ORCH-27: EmergencyStopFailedError debe encadenar la excepción original."""
         hal, state, mqtt = deps
@@ -346,6 +448,44 @@ class TestManejoErrores:
             await orch.trigger()
         assert exc_info.value.__cause__ is original
 
+    @pytest.mark.asyncio(loop_scope="session")
+    @pytest.mark.parametrize("task_group", [True, False], ids=["taskgroup", "fallback"])
+    async def test_fallo_cancela_conexion_pendiente(self, deps, task_group):
+        """TC-ORCH-40: Si la secuencia falla, la conexión al broker en curso se cancela."""
+        import safety_orchestrator
+        hal, state, mqtt = deps
+        conexion = []
+
+        async def connect_fn():
+            try:
+                await asyncio.Event().wait()   # handshake que nunca termina
+            except asyncio.CancelledError:
+                conexion.append("CANCELADA")
+                raise
+
+        original = ValueError("Estado inválido")
+        mqtt.connect = connect_fn
+        state.cambiar_estado = AsyncMock(side_effect=original)
+        orch = SafetyOrchestrator(hal, state, mqtt)
+
+        tg = safety_orchestrator._TaskGroup if task_group else None
+        with patch.object(safety_orchestrator, "_TaskGroup", tg):
+            with pytest.raises(EmergencyStopFailedError) as exc_info:
+                await orch.trigger()
+        assert conexion == ["CANCELADA"]
+        assert exc_info.value.__cause__ is original
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_fallo_de_conexion_anticipada_no_aborta(self, deps):
+        """TC-ORCH-41: Un fallo de connect() no interrumpe el corte ni el estado."""
+        hal, state, mqtt = deps
+        mqtt.connect = AsyncMock(side_effect=ConnectionError("Broker no disponible"))
+        orch = SafetyOrchestrator(hal, state, mqtt)
+
+        result = await orch.trigger()
+        assert result.status == "OK"
+        state.cambiar_estado.assert_awaited_once()
+
 
 # ══════════════════════════════════════════════════════════════════
 #  SUITE 6 — Flujo reset()
@@ -358,35 +498,31 @@ class TestReset:
         """Orquestador después de un trigger() exitoso (simulado)."""
         hal, state, mqtt = deps
         orch = SafetyOrchestrator(hal, state, mqtt)
-        orch._running = True
-        # Simular que el state está en EMERGENCY_STOP→RESTORING→NORMAL
-        resultados = [
-            StateChangeResult("OK", SystemState.RESTORING, SystemState.EMERGENCY_STOP),
-            StateChangeResult("OK", SystemState.NORMAL,    SystemState.RESTORING),
-        ]
-        state.cambiar_estado = AsyncMock(side_effect=resultados)
+        _force_state(orch, running=True)
+        # Simular que el state pasa EMERGENCY_STOP→RESTORING→NORMAL
+        state.restore = AsyncMock(return_value=_STATE_OK_RESTORED)
         return orch
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_retorna_reset_result(self, orch_post_stop):
         """TC-ORCH-28: reset() debe retornar un ResetResult."""
         result = await orch_post_stop.reset()
         assert isinstance(result, ResetResult)
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_status_ok(self, orch_post_stop):
         """TC-ORCH-29: El status del ResetResult debe ser OK."""
         result = await orch_post_stop.reset()
         assert result.status == "OK"
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_libera_is_running(self, orch_post_stop):
         """TC-ORCH-30: reset() debe poner is_running en False."""
         assert orch_post_stop.is_running is True
         await orch_post_stop.reset()
         assert orch_post_stop.is_running is False
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_publica_en_topic_restore(self, orch_post_stop, deps):
         """TC-ORCH-31: reset() debe publicar en el topic de restore."""
         _, _, mqtt = deps
@@ -394,7 +530,7 @@ class TestReset:
         topic_usado = mqtt.publish.call_args[0][0]
         assert topic_usado == "gva/07/safety/restore"
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_payload_event_system_restored(self, orch_post_stop, deps):
         """TC-ORCH-32: El payload del reset debe contener SYSTEM_RESTORED."""
         _, _, mqtt = deps
@@ -402,7 +538,7 @@ class TestReset:
         payload = mqtt.publish.call_args[0][1]
         assert payload["event"] == "SYSTEM_RESTORED"
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_payload_trigger_operator(self, orch_post_stop, deps):
         """TC-ORCH-33: El payload del reset debe indicar OPERATOR_MANUAL."""
         _, _, mqtt = deps
@@ -410,8 +546,50 @@ class TestReset:
         payload = mqtt.publish.call_args[0][1]
         assert payload["trigger"] == "OPERATOR_MANUAL"
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_reset_tiene_duration_ms_positiva(self, orch_post_stop):
         """TC-ORCH-34: El ResetResult debe tener duration_ms > 0."""
         result = await orch_post_stop.reset()
         assert result.duration_ms > 0
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_reset_duration_ms_resolucion_submilisegundo(self, orch_post_stop):
+        """TC-ORCH-47: duration_ms del reset se mide con perf_counter y conserva fracciones de ms."""
+        with patch("time.perf_counter", side_effect=[10.0, 10.0004]):
+            result = await orch_post_stop.reset()
+        assert result.duration_ms == 0.4
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_publisher_que_modifica_payload_no_altera_la_clase(self, deps):
+        """TC-ORCH-43: Cada publicación recibe un payload nuevo, aunque el publisher modifique el anterior."""
+        hal, state, mqtt = deps
+        eventos = []
+
+        async def publish_fn(topic, payload, **_):
+            eventos.append(payload["event"])
+            payload["event"] = "CORRUPTO"
+            return _MQTT_OK
+
+        mqtt.publish = publish_fn
+        orch = SafetyOrchestrator(hal, state, mqtt)
+        for _ in range(2):
+            await orch.trigger()
+            await orch.reset()
+        assert eventos == ["EMERGENCY_STOP", "SYSTEM_RESTORED"] * 2
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_reset_pasa_deadline_a_restore(self, orch_post_stop, deps):
+        """TC-ORCH-45: La espera de RESET_DELAY_MS se delega a restore() como min_complete_at."""
+        _, state, _ = deps
+        await orch_post_stop.reset()
+        deadline = state.restore.call_args.kwargs["min_complete_at"]
+        restante = deadline - asyncio.get_running_loop().time()
+        assert restante == pytest.approx(orch_post_stop.RESET_DELAY_MS / 1000, abs=0.05)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_reset_usa_transicion_compuesta(self, orch_post_stop, deps):
+        """TC-ORCH-39: reset() restaura el estado con una única llamada a restore()."""
+        _, state, _ = deps
+        await orch_post_stop.reset()
+        state.restore.assert_awaited_once()
+        state.cambiar_estado.assert_not_called()
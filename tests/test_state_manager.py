@@ -10,8 +10,7 @@ Ejecutar:
 """
 
 import pytest
-import pytest_asyncio
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from state_manager import (
     StateManager,
@@ -22,6 +21,13 @@ from state_manager import (
 )
 
 
+# Invariantes estructurales (TC-SM-28..30): se verifican una sola vez al
+# importar el módulo; si fallan, pytest lo reporta como error de colección.
+assert all(s in VALID_TRANSITIONS for s in SystemState), "TC-SM-28"
+assert StateManager.TRANSITION_DELAY_MS == 300, "TC-SM-29"
+assert [s.value_str for s in SystemState] == ["NORMAL", "EMERGENCY_STOP", "RESTORING"], "TC-SM-30"
+
+
 # ══════════════════════════════════════════════════════════════════
 #  FIXTURES
 # ══════════════════════════════════════════════════════════════════
@@ -34,11 +40,32 @@ def manager():
 
 @pytest.fixture
 def manager_en_emergency():
-    """StateManager ya en estado EMERGENCY_STOP (usando reset interno)."""
-    m = StateManager()
-    m._state = SystemState.EMERGENCY_STOP
-    m._history.append((SystemState.EMERGENCY_STOP, "2026-01-01T00:00:00"))
-    return m
+    """StateManager ya en estado EMERGENCY_STOP."""
+    return StateManager(initial_state=SystemState.EMERGENCY_STOP)
+
+
+@pytest.fixture(params=list(SystemState), ids=str)
+def manager_initial(request):
+    """StateManager construido en el estado inicial parametrizado."""
+    return StateManager(initial_state=request.param)
+
+
+@pytest.fixture(scope="session")
+def _cb_factory():
+    """Devuelve un callback MagicMock único de la sesión, con las llamadas borradas."""
+    mock_cb = MagicMock()
+
+    def make():
+        mock_cb.reset_mock()
+        return mock_cb
+
+    return make
+
+
+@pytest.fixture(scope="module")
+async def change_result():
+    """StateChangeResult de una única transición NORMAL → EMERGENCY_STOP."""
+    return await StateManager().cambiar_estado(SystemState.EMERGENCY_STOP)
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -47,31 +74,19 @@ def manager_en_emergency():
 
 class TestEstadoInicial:
 
-    def test_estado_inicial_es_normal(self, manager):
-        """TC-SM-01: El estado por defecto debe ser NORMAL."""
-        assert manager.current_state == SystemState.NORMAL
+    def test_estado_inicial_properties(self, manager, manager_en_emergency):
+        """TC-SM-01/03..06: Estado, historial e is_emergency de un StateManager recién creado."""
+        assert manager.current_state == SystemState.NORMAL                 # TC-SM-01
+        assert len(manager.history) == 1                                   # TC-SM-03
+        assert manager.history[0][0] == SystemState.NORMAL                 # TC-SM-04
+        assert manager.is_emergency is False                               # TC-SM-05
+        assert manager_en_emergency.is_emergency is True                   # TC-SM-06
 
-    def test_estado_inicial_personalizado(self):
+    def test_estado_inicial_personalizado(self, manager_initial, request):
         """TC-SM-02: Se puede inicializar con un estado personalizado."""
-        m = StateManager(initial_state=SystemState.EMERGENCY_STOP)
-        assert m.current_state == SystemState.EMERGENCY_STOP
-
-    def test_historial_inicial_tiene_un_elemento(self, manager):
-        """TC-SM-03: El historial comienza con exactamente un registro."""
-        assert len(manager.history) == 1
-
-    def test_historial_inicial_contiene_normal(self, manager):
-        """TC-SM-04: El primer elemento del historial es el estado inicial."""
-        estado, _ = manager.history[0]
-        assert estado == SystemState.NORMAL
-
-    def test_is_emergency_es_false_en_normal(self, manager):
-        """TC-SM-05: is_emergency debe ser False cuando el estado es NORMAL."""
-        assert manager.is_emergency is False
-
-    def test_is_emergency_es_true_en_emergency(self, manager_en_emergency):
-        """TC-SM-06: is_emergency debe ser True en EMERGENCY_STOP."""
-        assert manager_en_emergency.is_emergency is True
+        estado = request.node.callspec.params["manager_initial"]
+        assert manager_initial.current_state == estado
+        assert manager_initial.history[0][0] == estado
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -80,26 +95,42 @@ class TestEstadoInicial:
 
 class TestTransicionesValidas:
 
-    @pytest.mark.asyncio
-    async def test_normal_a_emergency_stop(self, manager):
-        """TC-SM-07: NORMAL → EMERGENCY_STOP es una transición válida."""
-        result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
-        assert manager.current_state == SystemState.EMERGENCY_STOP
-
-    @pytest.mark.asyncio
-    async def test_emergency_a_restoring(self, manager_en_emergency):
-        """TC-SM-08: EMERGENCY_STOP → RESTORING es una transición válida."""
-        result = await manager_en_emergency.cambiar_estado(SystemState.RESTORING)
-        assert manager_en_emergency.current_state == SystemState.RESTORING
-
-    @pytest.mark.asyncio
-    async def test_restoring_a_normal(self):
-        """TC-SM-09: RESTORING → NORMAL es una transición válida."""
-        m = StateManager(initial_state=SystemState.RESTORING)
-        await m.cambiar_estado(SystemState.NORMAL)
-        assert m.current_state == SystemState.NORMAL
-
-    @pytest.mark.asyncio
+    @pytest.mark.parametrize("manager_initial, target", [
+        pytest.param(SystemState.NORMAL,         SystemState.EMERGENCY_STOP, id="TC-SM-07"),
+        pytest.param(SystemState.EMERGENCY_STOP, SystemState.RESTORING,      id="TC-SM-08"),
+        pytest.param(SystemState.RESTORING,      SystemState.NORMAL,         id="TC-SM-09"),
+    ], indirect=["manager_initial"])
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_transicion_valida(self, manager_initial, target):
+        """TC-SM-07..09: Cada transición de la tabla se aplica al estado actual."""
+        await manager_initial.cambiar_estado(target)
+        assert manager_initial.current_state == target
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_min_complete_at_extiende_el_delay(self, manager):
+        """TC-SM-31: min_complete_at posterior al delay propio prevalece."""
+        import asyncio
+        deadline = asyncio.get_running_loop().time() + 1.0
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await manager.cambiar_estado(
+                SystemState.EMERGENCY_STOP, min_complete_at=deadline,
+            )
+        (delay,), _ = sleep.call_args
+        assert delay > StateManager.TRANSITION_DELAY_MS / 1000
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_transiciones_concurrentes_independientes(self):
+        """TC-SM-39: Instancias distintas transicionan en paralelo sin interferirse."""
+        import asyncio
+        managers = [StateManager(initial_state=s) for s in SystemState]
+        targets  = [SystemState.EMERGENCY_STOP, SystemState.RESTORING, SystemState.NORMAL]
+        results = await asyncio.gather(
+            *(m.cambiar_estado(t) for m, t in zip(managers, targets))
+        )
+        assert [m.current_state for m in managers] == targets
+        assert [r.previous for r in results] == list(SystemState)
+
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_secuencia_completa_ciclo(self, manager):
         """TC-SM-10: Ciclo completo NORMAL→EMERGENCY→RESTORING→NORMAL."""
         await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
@@ -114,28 +145,21 @@ class TestTransicionesValidas:
 
 class TestTransicionesInvalidas:
 
-    @pytest.mark.asyncio
-    async def test_normal_a_restoring_invalido(self, manager):
-        """TC-SM-11: NORMAL → RESTORING debe lanzar InvalidStateTransitionError."""
+    @pytest.mark.parametrize("manager_initial, target", [
+        pytest.param(SystemState.NORMAL,         SystemState.RESTORING, id="TC-SM-11"),
+        pytest.param(SystemState.NORMAL,         SystemState.NORMAL,    id="TC-SM-12"),
+        pytest.param(SystemState.EMERGENCY_STOP, SystemState.NORMAL,    id="TC-SM-13"),
+    ], indirect=["manager_initial"])
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_transicion_invalida(self, manager_initial, target):
+        """TC-SM-11..13: Una transición fuera de la tabla lanza InvalidStateTransitionError."""
+        start = manager_initial.current_state
         with pytest.raises(InvalidStateTransitionError) as exc:
-            await manager.cambiar_estado(SystemState.RESTORING)
-        assert "NORMAL" in str(exc.value)
-        assert "RESTORING" in str(exc.value)
-
-    @pytest.mark.asyncio
-    async def test_normal_a_normal_invalido(self, manager):
-        """TC-SM-12: NORMAL → NORMAL no está permitido."""
-        with pytest.raises(InvalidStateTransitionError):
-            await manager.cambiar_estado(SystemState.NORMAL)
+            await manager_initial.cambiar_estado(target)
+        assert start.value_str in str(exc.value)
+        assert target.value_str in str(exc.value)
 
-    @pytest.mark.asyncio
-    async def test_emergency_a_normal_invalido(self, manager_en_emergency):
-        """TC-SM-13: EMERGENCY_STOP → NORMAL directo no está permitido."""
-        with pytest.raises(InvalidStateTransitionError) as exc:
-            await manager_en_emergency.cambiar_estado(SystemState.NORMAL)
-        assert "EMERGENCY_STOP" in str(exc.value)
-
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_estado_no_cambia_si_transicion_invalida(self, manager):
         """TC-SM-14: El estado NO debe cambiar si la transición falla."""
         with pytest.raises(InvalidStateTransitionError):
@@ -149,37 +173,37 @@ class TestTransicionesInvalidas:
 
 class TestStateChangeResult:
 
-    @pytest.mark.asyncio
-    async def test_resultado_status_ok(self, manager):
+    def test_resultado_status_ok(self, change_result):
         """TC-SM-15: El resultado debe tener status 'OK'."""
-        result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
-        assert result.status == "OK"
+        assert change_result.status == "OK"
 
-    @pytest.mark.asyncio
-    async def test_resultado_estado_correcto(self, manager):
+    def test_resultado_estado_correcto(self, change_result):
         """TC-SM-16: El resultado debe reflejar el nuevo estado."""
-        result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
-        assert result.state == SystemState.EMERGENCY_STOP
+        assert change_result.state == SystemState.EMERGENCY_STOP
 
-    @pytest.mark.asyncio
-    async def test_resultado_previous_correcto(self, manager):
+    def test_resultado_previous_correcto(self, change_result):
         """TC-SM-17: El resultado debe incluir el estado anterior."""
-        result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
-        assert result.previous == SystemState.NORMAL
+        assert change_result.previous == SystemState.NORMAL
 
-    @pytest.mark.asyncio
-    async def test_resultado_tiene_timestamp(self, manager):
-        """TC-SM-18: El resultado debe incluir un timestamp ISO."""
-        result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
-        assert result.timestamp is not None
-        assert "T" in result.timestamp  # formato ISO 8601
+    def test_resultado_tiene_timestamp(self, change_result):
+        """TC-SM-18: El resultado incluye un timestamp en ns, ISO al serializar."""
+        assert isinstance(change_result.timestamp, int)
+        assert "T" in change_result.to_dict()["timestamp"]  # formato ISO 8601
 
-    @pytest.mark.asyncio
-    async def test_resultado_es_inmutable(self, manager):
+    def test_resultado_es_inmutable(self, change_result):
         """TC-SM-19: StateChangeResult es un dataclass frozen (inmutable)."""
-        result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
         with pytest.raises((AttributeError, TypeError)):
-            result.status = "ERROR"  # type: ignore
+            change_result.status = "ERROR"  # type: ignore
+
+    def test_resultado_usa_slots(self, change_result):
+        """TC-SM-32: StateChangeResult usa __slots__ (sin __dict__ por instancia)."""
+        assert not hasattr(change_result, "__dict__")
+
+    def test_resultado_to_dict_usa_nombres_de_estado(self, change_result):
+        """TC-SM-38: to_dict() serializa state y previous por nombre."""
+        data = change_result.to_dict()
+        assert data["state"]    == "EMERGENCY_STOP"
+        assert data["previous"] == "NORMAL"
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -188,14 +212,14 @@ class TestStateChangeResult:
 
 class TestHistorial:
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_historial_crece_con_transiciones(self, manager):
         """TC-SM-20: El historial debe crecer con cada transición."""
         assert len(manager.history) == 1
         await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
         assert len(manager.history) == 2
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_historial_refleja_secuencia_correcta(self, manager):
         """TC-SM-21: El historial debe registrar los estados en orden."""
         await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
@@ -207,12 +231,22 @@ class TestHistorial:
             SystemState.RESTORING,
         ]
 
-    @pytest.mark.asyncio
-    async def test_historial_devuelve_copia(self, manager):
-        """TC-SM-22: history debe devolver una copia (no la lista interna)."""
-        h = manager.history
-        h.append((SystemState.EMERGENCY_STOP, "fake"))
-        assert len(manager.history) == 1  # la interna no debe verse afectada
+    def test_historial_devuelve_copia(self, manager):
+        """TC-SM-22: history debe devolver una copia inmutable del historial."""
+        h1 = manager.history
+        h2 = manager.history
+        assert isinstance(h1, tuple)
+        assert h1 is not h2 and h1 == h2
+        assert h1 is not manager._history
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_historial_acotado_por_history_size(self):
+        """TC-SM-33: El historial conserva solo las últimas history_size entradas."""
+        m = StateManager(history_size=2)
+        await m.cambiar_estado(SystemState.EMERGENCY_STOP)
+        await m.cambiar_estado(SystemState.RESTORING)
+        states = [h[0] for h in m.history]
+        assert states == [SystemState.EMERGENCY_STOP, SystemState.RESTORING]
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -221,18 +255,18 @@ class TestHistorial:
 
 class TestCallback:
 
-    @pytest.mark.asyncio
-    async def test_callback_es_invocado(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_callback_es_invocado(self, _cb_factory):
         """TC-SM-23: El callback debe llamarse al cambiar de estado."""
-        mock_cb = MagicMock()
+        mock_cb = _cb_factory()
         m = StateManager(on_state_change=mock_cb)
         await m.cambiar_estado(SystemState.EMERGENCY_STOP)
         mock_cb.assert_called_once()
 
-    @pytest.mark.asyncio
-    async def test_callback_recibe_estados_correctos(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_callback_recibe_estados_correctos(self, _cb_factory):
         """TC-SM-24: El callback recibe (estado_anterior, estado_nuevo)."""
-        mock_cb = MagicMock()
+        mock_cb = _cb_factory()
         m = StateManager(on_state_change=mock_cb)
         await m.cambiar_estado(SystemState.EMERGENCY_STOP)
         mock_cb.assert_called_once_with(
@@ -240,7 +274,7 @@ class TestCallback:
             SystemState.EMERGENCY_STOP,
         )
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_sin_callback_no_falla(self, manager):
         """TC-SM-25: Sin callback registrado no debe lanzar excepción."""
         result = await manager.cambiar_estado(SystemState.EMERGENCY_STOP)
@@ -259,7 +293,7 @@ class TestReset:
         manager_en_emergency.reset()
         assert manager_en_emergency.current_state == SystemState.NORMAL
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="session")
     async def test_tras_reset_permite_transicion_a_emergency(self, manager_en_emergency):
         """TC-SM-27: Tras reset() se puede volver a disparar emergency."""
         manager_en_emergency.reset()
@@ -268,23 +302,76 @@ class TestReset:
 
 
 # ══════════════════════════════════════════════════════════════════
-#  SUITE 8 — Constantes y tabla de transiciones
+#  SUITE 8 — Restablecimiento compuesto (restore)
 # ══════════════════════════════════════════════════════════════════
 
-class TestConstantes:
+class TestRestore:
 
-    def test_valid_transitions_cubre_todos_los_estados(self):
-        """TC-SM-28: VALID_TRANSITIONS debe tener entrada para cada estado."""
-        for state in SystemState:
-            assert state in VALID_TRANSITIONS
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_termina_en_normal(self, manager_en_emergency):
+        """TC-SM-34: restore() lleva EMERGENCY_STOP → NORMAL y lo informa."""
+        result = await manager_en_emergency.restore()
+        assert manager_en_emergency.current_state == SystemState.NORMAL
+        assert result.state    == SystemState.NORMAL
+        assert result.previous == SystemState.RESTORING
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_registra_ambos_pasos(self, _cb_factory):
+        """TC-SM-35: restore() agrega RESTORING y NORMAL al historial y al callback."""
+        mock_cb = _cb_factory()
+        m = StateManager(initial_state=SystemState.EMERGENCY_STOP, on_state_change=mock_cb)
+        await m.restore()
+        assert [s for s, _ in m.history[-2:]] == [SystemState.RESTORING, SystemState.NORMAL]
+        assert mock_cb.call_args_list == [
+            ((SystemState.EMERGENCY_STOP, SystemState.RESTORING),),
+            ((SystemState.RESTORING, SystemState.NORMAL),),
+        ]
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_un_solo_delay(self, manager_en_emergency):
+        """TC-SM-36: restore() espera un único TRANSITION_DELAY_MS."""
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await manager_en_emergency.restore()
+        sleep.assert_awaited_once_with(StateManager.TRANSITION_DELAY_MS / 1000)
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_desde_normal_es_invalido(self, manager):
+        """TC-SM-37: restore() desde NORMAL lanza error y no cambia el estado."""
+        with pytest.raises(InvalidStateTransitionError):
+            await manager.restore()
+        assert manager.current_state == SystemState.NORMAL
+        assert len(manager.history) == 1
 
-    def test_delay_de_transicion_es_300ms(self):
-        """TC-SM-29: TRANSITION_DELAY_MS debe ser 300."""
-        assert StateManager.TRANSITION_DELAY_MS == 300
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_callback_ve_estado_de_cada_paso(self):
+        """TC-SM-40: Durante cada callback de restore() current_state es el destino del paso."""
+        vistos = []
+        m = StateManager(
+            initial_state=SystemState.EMERGENCY_STOP,
+            on_state_change=lambda _prev, _new: vistos.append(m.current_state),
+        )
+        await m.restore()
+        assert vistos == [SystemState.RESTORING, SystemState.NORMAL]
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_valida_segundo_paso_con_mismo_formato(self, manager_en_emergency):
+        """TC-SM-41: Si RESTORING → NORMAL no está permitida, el error usa el formato común."""
+        import state_manager
+        sin_salida = (*state_manager._ALLOWED[:SystemState.RESTORING], frozenset())
+        with patch.object(state_manager, "_ALLOWED", sin_salida):
+            with pytest.raises(InvalidStateTransitionError) as exc_info:
+                await manager_en_emergency.restore()
+        assert str(exc_info.value) == (
+            "Transición inválida: RESTORING → NORMAL. Permitidas desde RESTORING: []"
+        )
+        assert manager_en_emergency.current_state == SystemState.EMERGENCY_STOP
 
-    def test_system_state_tiene_tres_valores(self):
-        """TC-SM-30: El enum SystemState debe tener exactamente 3 valores."""
-        assert len(SystemState) == 3
-        assert SystemState.NORMAL         == "NORMAL"
-        assert SystemState.EMERGENCY_STOP == "EMERGENCY_STOP"
-        assert SystemState.RESTORING      == "RESTORING"
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_restore_min_complete_at_extiende_el_delay(self, manager_en_emergency):
+        """TC-SM-42: En restore(), min_complete_at posterior al delay propio prevalece."""
+        import asyncio
+        deadline = asyncio.get_running_loop().time() + 1.0
+        with patch("asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await manager_en_emergency.restore(min_complete_at=deadline)
+        (delay,), _ = sleep.call_args
+        assert delay == pytest.approx(1.0, abs=0.05)